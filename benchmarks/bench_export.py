@@ -0,0 +1,108 @@
+"""
+Compara el throughput de exportar el catálogo con GET /api/v1/videos/export (NDJSON) contra
+paginar GET /api/v1/videos/ (lista JSON validada con VideoInDB), sobre mongomock.
+
+Uso:
+    python -m benchmarks.bench_export [--videos 20000] [--page-size 1000] [--batch-size 1000]
+
+Necesita mongomock-motor (pip install mongomock-motor). Mide la API y la serialización; con
+un Mongo real el tiempo de red y del servidor se suma igual a ambos caminos.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from routes import video_routes
+from service.video_cache import VideoCache
+from service.video_service import VideoService
+from service.view_counter import ViewCounter
+
+
+def seed(collection, count: int):
+    start = datetime(2024, 1, 1)
+    documents = [{
+        'title': f"video {i}",
+        'description': "descripción de prueba" if i % 2 else None,
+        'duration_seconds': 30 + i % 600,
+        'rating_stars': i % 5 + 1,
+        'uploader_username': f"user{i % 100}",
+        'video_uuid': str(uuid.uuid4()),
+        'views': i,
+        'upload_date': start + timedelta(seconds=i),
+    } for i in range(count)]
+    asyncio.run(collection.insert_many(documents))
+
+
+def make_client(collection) -> TestClient:
+    app = FastAPI()
+    app.include_router(video_routes.router, prefix="/api/v1/videos")
+
+    def video_service():
+        service = VideoService(collection, cache=VideoCache(), counter=ViewCounter())
+        # with_options de mongomock-motor devuelve una colección síncrona
+        service.list_collection = collection
+        return service
+
+    app.dependency_overrides[video_routes.get_video_service] = video_service
+    return TestClient(app)
+
+
+def list_all(client: TestClient, page_size: int) -> int:
+    total, skip = 0, 0
+    while True:
+        page = client.get("/api/v1/videos/", params={"skip": skip, "limit": page_size}).json()
+        total += len(page)
+        skip += page_size
+        if len(page) < page_size:
+            return total
+
+
+def export_all(client: TestClient, batch_size: int) -> int:
+    total = 0
+    with client.stream("GET", "/api/v1/videos/export", params={"batch_size": batch_size}) as response:
+        for _ in response.iter_lines():
+            total += 1
+    return total
+
+
+def measure(fn, *args) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        count = fn(*args)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"documents": count, "seconds": seconds, "docs_per_s": count / seconds, "peak_mb": peak / 2 ** 20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    collection = AsyncMongoMockClient().videos_db.videos
+    seed(collection, args.videos)
+    client = make_client(collection)
+
+    results = {
+        "lista paginada": measure(list_all, client, args.page_size),
+        "export NDJSON": measure(export_all, client, args.batch_size),
+    }
+    print(f"{'camino':<18}{'documentos':>12}{'segundos':>11}{'docs/s':>11}{'pico MB':>10}")
+    for name, row in results.items():
+        print(f"{name:<18}{row['documents']:>12}{row['seconds']:>11.3f}{row['docs_per_s']:>11.0f}{row['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
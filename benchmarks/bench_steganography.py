@@ -0,0 +1,85 @@
+"""
+Compara el motor LSB vectorizado de util.steganography con la implementación original.
+
+Uso:
+    python -m benchmarks.bench_steganography [--sizes 256 512 1024] [--repeat 3]
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks import legacy_steganography as legacy
+from util import steganography as current
+
+MESSAGE = "http://localhost:8000/api/v1/videos/d6dce7a2-47e9-44b5-801d-0879e59ec068"
+
+
+def make_png(size: int) -> bytes:
+    rng = np.random.default_rng(size)
+    pixels = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_frames(size: int, count: int) -> list:
+    rng = np.random.default_rng(size + count)
+    return [rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def timed(fn, *args, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_image(size: int, repeat: int) -> dict:
+    png = make_png(size)
+    old_hide, old_png = timed(legacy.hide_message_image, png, MESSAGE, repeat=repeat)
+    new_hide, new_png = timed(current.hide_message_image, png, MESSAGE, repeat=repeat)
+    old_reveal, old_msg = timed(legacy.reveal_message_image, old_png, repeat=repeat)
+    new_reveal, new_msg = timed(current.reveal_message_image, new_png, repeat=repeat)
+    assert old_msg == new_msg == MESSAGE
+    assert current.reveal_message_image(old_png) == MESSAGE, "No se pudo leer el formato antiguo"
+    return {"size": size, "old_hide": old_hide, "new_hide": new_hide,
+            "old_reveal": old_reveal, "new_reveal": new_reveal}
+
+
+def bench_frames(size: int, count: int, repeat: int) -> dict:
+    frames = make_frames(size, count)
+    old_hide, old_frames = timed(legacy.hide_message_in_frames, frames, MESSAGE, repeat=repeat)
+    new_hide, new_frames = timed(current.hide_message_in_frames, frames, MESSAGE, repeat=repeat)
+    old_reveal, old_msg = timed(legacy.reveal_message_from_frames, old_frames, repeat=repeat)
+    new_reveal, new_msg = timed(current.reveal_message_from_frames, new_frames, repeat=repeat)
+    assert old_msg == new_msg == MESSAGE
+    assert current.reveal_message_from_frames(old_frames) == MESSAGE, "No se pudo leer el formato antiguo"
+    return {"size": size, "frames": count, "old_hide": old_hide, "new_hide": new_hide,
+            "old_reveal": old_reveal, "new_reveal": new_reveal}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'caso':<22}{'ocultar (orig)':>16}{'ocultar (nuevo)':>17}{'revelar (orig)':>16}{'revelar (nuevo)':>17}")
+    for size in args.sizes:
+        row = bench_image(size, args.repeat)
+        print(f"{f'imagen {size}px':<22}{row['old_hide']:>15.4f}s{row['new_hide']:>16.4f}s"
+              f"{row['old_reveal']:>15.4f}s{row['new_reveal']:>16.4f}s")
+        row = bench_frames(size, args.frames, args.repeat)
+        print(f"{f'{args.frames} frames {size}px':<22}{row['old_hide']:>15.4f}s{row['new_hide']:>16.4f}s"
+              f"{row['old_reveal']:>15.4f}s{row['new_reveal']:>16.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Presupuesto de tiempo de importación de main. Ejecuta python -X importtime -c "import main" en
+un proceso nuevo, muestra el total y los módulos más costosos, y termina con código 1 si se
+carga alguna librería de medios (numpy, Pillow, imageio, moviepy) o si se supera el presupuesto.
+
+Uso:
+    python -m benchmarks.import_budget [--budget-ms 1000] [--top 15] [--runs 3]
+
+Con --runs se toma la ejecución más rápida: la primera suele incluir la lectura de disco.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Solo deben cargarse dentro de los procesos del pool de medios
+FORBIDDEN_MODULES = ("numpy", "PIL", "imageio", "imageio_ffmpeg", "moviepy")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict:
+    """Tiempo acumulado en microsegundos de cada módulo importado por module."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # import time: self [us] | cumulative | nombre (indentado según la profundidad)
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    times = min((import_times(args.module) for _ in range(args.runs)), key=lambda t: t[args.module])
+    total_ms = times[args.module] / 1000
+
+    print(f"{'módulo':<50}{'ms':>10}")
+    for name, micros in sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<50}{micros / 1000:>10.1f}")
+
+    failed = False
+    loaded = [name for name in times if name.split(".")[0] in FORBIDDEN_MODULES]
+    if loaded:
+        print(f"\nSe cargaron librerías de medios al importar {args.module}: {', '.join(sorted(loaded)[:10])}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nImportar {args.module} tomó {total_ms:.0f} ms, el presupuesto es {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"\nImportar {args.module} tomó {total_ms:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,145 @@
 import os
+from typing import List, Literal, Optional, Union
+
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, ReadPreference, WriteConcern
+from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo.monitoring import ConnectionPoolListener
+
+from util.metrics import MongoCommandMetrics
 
 MONGO_DETAILS = os.environ.get("MONGO_URI")
 
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class MongoSettings(BaseModel):
+    max_pool_size: int = Field(100, ge=1, description="Conexiones máximas por worker (maxPoolSize).")
+    min_pool_size: int = Field(0, ge=0, description="Conexiones que se mantienen abiertas (minPoolSize).")
+    max_idle_time_ms: Optional[int] = Field(None, ge=0, description="Tiempo antes de cerrar una conexión ociosa.")
+    wait_queue_timeout_ms: Optional[int] = Field(None, ge=0, description="Espera máxima por una conexión libre.")
+    compressors: List[str] = Field(default_factory=list, description="zstd, snappy y/o zlib, en orden de preferencia.")
+    list_read_preference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = \
+        Field("primary", description="Preferencia de lectura para los listados de videos.")
+    view_write_concern: Union[int, str] = Field(1, description="Write concern (w) de las escrituras de vistas.")
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        def env(name):
+            return os.environ.get(name) or None
+
+        values = {
+            "max_pool_size": env("MONGO_MAX_POOL_SIZE"),
+            "min_pool_size": env("MONGO_MIN_POOL_SIZE"),
+            "max_idle_time_ms": env("MONGO_MAX_IDLE_TIME_MS"),
+            "wait_queue_timeout_ms": env("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+            "compressors": [c.strip() for c in env("MONGO_COMPRESSORS").split(",")] if env("MONGO_COMPRESSORS") else None,
+            "list_read_preference": env("MONGO_LIST_READ_PREFERENCE"),
+            "view_write_concern": env("MONGO_VIEW_WRITE_CONCERN"),
+        }
+        if values["view_write_concern"] and values["view_write_concern"].isdigit():
+            values["view_write_concern"] = int(values["view_write_concern"])
+        return cls(**{k: v for k, v in values.items() if v is not None})
+
+    def client_options(self) -> dict:
+        options = {"maxPoolSize": self.max_pool_size, "minPoolSize": self.min_pool_size}
+        if self.max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        return options
+
+    def read_preference(self):
+        return READ_PREFERENCES[self.list_read_preference]
+
+    def write_concern(self) -> WriteConcern:
+        return WriteConcern(w=self.view_write_concern)
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """Métricas del pool de conexiones del driver: conexiones en uso y tiempos de espera para obtenerlas."""
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _record_wait(self, duration: Optional[float]):
+        if duration is not None:
+            self.wait_time_total += duration
+            self.wait_time_max = max(self.wait_time_max, duration)
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.checkouts += 1
+        self._record_wait(event.duration)
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+        self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_closed(self, event):
+        self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "open_connections": self.open_connections,
+            "checked_out": self.checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "wait_time_avg_seconds": self.wait_time_total / self.checkouts if self.checkouts else 0.0,
+            "wait_time_max_seconds": self.wait_time_max,
+        }
+
+
+# Un valor inválido en las variables de entorno falla aquí, al importar, y no en cada solicitud
+mongo_settings = MongoSettings.from_env()
+list_read_preference = mongo_settings.read_preference()
+pool_metrics = PoolMetrics()
+
 client: AsyncIOMotorClient = None
 
 async def mongo_connect():
     global client
     try:
-        client = AsyncIOMotorClient(MONGO_DETAILS)
+        client = AsyncIOMotorClient(MONGO_DETAILS, event_listeners=[pool_metrics, MongoCommandMetrics()],
+                                    **mongo_settings.client_options())
         await client.admin.command('ping')
         print("Conectado a mongo!")
     except ConnectionFailure as e:
@@ -27,4 +157,40 @@ async def mongo_disconnect():
         print("Conexión cerrada")
 
 def get_database():
-    return client.videos_db
\ No newline at end of file
+    return client.videos_db
+
+
+# (colección, llaves, opciones) de cada índice que se crea al arrancar
+INDEXES = [
+    ('videos', 'video_uuid', {'unique': True}),
+    ('videos', 'uploader_username', {}),
+    ('videos', [('upload_date', DESCENDING), ('_id', DESCENDING)], {}),
+    ('videos', [('views', DESCENDING), ('_id', DESCENDING)], {}),
+    ('uploader_stats', [('total_views', DESCENDING), ('_id', ASCENDING)], {}),
+    ('uploader_stats', [('video_count', DESCENDING), ('_id', ASCENDING)], {}),
+    ('jobs', 'job_id', {'unique': True}),
+    ('jobs', [('status', ASCENDING), ('created_at', ASCENDING)], {}),
+    ('jobs', [('status', ASCENDING), ('updated_at', ASCENDING)], {}),
+]
+
+
+async def ensure_indexes():
+    """Cada índice se crea por separado: si uno falla los demás se crean igual."""
+    db = get_database()
+    try:
+        # Los documentos antiguos no guardaban upload_date; se toma del timestamp de su ObjectId
+        await db.videos.update_many({'upload_date': {'$exists': False}},
+                                    [{'$set': {'upload_date': {'$toDate': '$_id'}}}])
+    except OperationFailure as e:
+        print(f"No se pudo completar upload_date en los videos antiguos: {e}")
+
+    failed = 0
+    for collection, keys, options in INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            # Por ejemplo, UUIDs duplicados que impiden el índice único; la API sigue funcionando sin él
+            print(f"No se pudo crear el índice {keys} en {collection}: {e}")
+            failed += 1
+    if not failed:
+        print("Índices verificados")
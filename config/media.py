@@ -0,0 +1,54 @@
+import os
+import struct
+
+# Límites, formatos y opciones de codificación de medios. Este módulo no importa numpy, Pillow
+# ni moviepy, así el proceso principal puede leerlos sin cargar esas librerías.
+
+MAX_MESSAGE_LENGTH = 5000
+
+# Encabezado del mensaje oculto: magic, versión, largo del payload (bytes) y CRC32 del payload.
+# La versión forma parte de la clave del caché de resultados.
+HEADER_MAGIC = b'SVP'
+HEADER_VERSION = 1
+HEADER_STRUCT = struct.Struct('>3sBII')
+HEADER_BITS = HEADER_STRUCT.size * 8
+
+# Los portadores con frames más grandes se rechazan antes de decodificarlos (8192x8192 en RGB son 192 MB)
+MAX_FRAME_PIXELS = int(os.environ.get("MAX_FRAME_PIXELS", 8192 * 8192))
+
+# Compresión del PNG de salida: 0 (sin comprimir, más rápido) a 9 (más pequeño). optimize
+# hace una pasada extra mucho más lenta y fuerza el nivel 9.
+PNG_COMPRESS_LEVEL = int(os.environ.get("PNG_COMPRESS_LEVEL", 6))
+PNG_OPTIMIZE = os.environ.get("PNG_OPTIMIZE", "false").lower() in ("1", "true", "yes")
+
+# Perfiles de codificación para la salida. Solo los sin pérdida conservan los LSB del mensaje.
+VIDEO_CODECS = {
+    # H.264 en RGB con cuantización 0: sin pérdida y sigue siendo un .mp4
+    "x264rgb": {
+        "codec": "libx264rgb",
+        "pix_fmt_out": "rgb24",
+        "output_params": ["-qp", "0", "-preset", "ultrafast"],
+        "extension": ".mp4",
+        "media_type": "video/mp4",
+    },
+    "ffv1": {
+        "codec": "ffv1",
+        "pix_fmt_out": "bgr0",
+        "output_params": ["-level", "3"],
+        "extension": ".mkv",
+        "media_type": "video/x-matroska",
+    },
+    # Comportamiento anterior: compatible con cualquier reproductor pero destruye el mensaje
+    "x264": {
+        "codec": "libx264",
+        "pix_fmt_out": "yuv420p",
+        "output_params": [],
+        "extension": ".mp4",
+        "media_type": "video/mp4",
+    },
+}
+
+DEFAULT_VIDEO_CODEC = os.environ.get("VIDEO_CODEC", "x264rgb")
+
+# Carga numpy, Pillow y moviepy en los procesos del pool al arrancar en vez de con el primer archivo
+MEDIA_PREWARM = os.environ.get("MEDIA_PREWARM", "false").lower() in ("1", "true", "yes")
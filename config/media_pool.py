@@ -0,0 +1,184 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException
+
+MEDIA_WORKERS = int(os.environ.get("MEDIA_WORKERS", os.cpu_count() or 1))
+MEDIA_MAX_PENDING = int(os.environ.get("MEDIA_MAX_PENDING", MEDIA_WORKERS * 2))
+MEDIA_JOB_TIMEOUT = float(os.environ.get("MEDIA_JOB_TIMEOUT", 120))
+
+
+class PoolReservation:
+    """
+    Cupos del límite de pendientes reservados para un lote. Cada trabajo del lote ocupa un cupo
+    libre de la reserva mientras corre, en vez de sumar uno nuevo, y lo devuelve al terminar.
+    """
+
+    def __init__(self, pool: "MediaPool", slots: int):
+        self.pool = pool
+        self.slots = slots
+        self.idle = slots
+        self.released = False
+
+    def take(self) -> bool:
+        if self.released or self.idle <= 0:
+            return False
+        self.idle -= 1
+        self.pool.reserved -= 1
+        return True
+
+    def give_back(self):
+        # Un trabajo que termina después de release ya no vuelve a la reserva
+        if not self.released:
+            self.idle += 1
+            self.pool.reserved += 1
+
+    def release(self):
+        """Devuelve al pool los cupos libres; los que están en uso se liberan al terminar su trabajo."""
+        if not self.released:
+            self.released = True
+            self.pool.reserved -= self.idle
+            self.idle = 0
+
+
+class MediaPool:
+    """
+    Pool de procesos para el trabajo de CPU (decodificar, incrustar, codificar) fuera del event loop.
+    Limita los trabajos en curso (ejecutándose + en cola) más los cupos reservados por lotes y
+    responde 429 cuando está saturado.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        # Cupos reservados por lotes que no tienen un trabajo en curso
+        self.reserved = 0
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn evita heredar el event loop y los hilos del cliente de Mongo en los procesos hijos
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _rebuild(self, broken: ProcessPoolExecutor):
+        """Reemplaza el pool cuando un proceso murió (p. ej. por falta de memoria) y lo dejó inutilizable."""
+        # Todos los trabajos en curso fallan a la vez; solo el primero en enterarse lo reemplaza
+        if self.executor is broken:
+            self.executor = self._new_executor()
+            broken.shutdown(wait=False, cancel_futures=True)
+            print("Un proceso del pool de medios terminó de forma inesperada; pool reiniciado")
+
+    def _release_when_done(self, future: Future, loop: asyncio.AbstractEventLoop,
+                           reservation: Optional[PoolReservation]):
+        """
+        Libera el cupo cuando el proceso termina el trabajo, no cuando se deja de esperarlo: un trabajo
+        que superó el tiempo sigue ocupando un proceso. El callback corre en un hilo del pool.
+        """
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release, reservation)
+            except RuntimeError:
+                # El event loop ya se cerró
+                pass
+
+        future.add_done_callback(release)
+
+    def _release(self, reservation: Optional[PoolReservation] = None):
+        self.pending -= 1
+        if reservation:
+            reservation.give_back()
+
+    @staticmethod
+    def _saturated() -> HTTPException:
+        return HTTPException(status_code=429, detail="El servidor está procesando demasiados archivos, intenta más tarde.",
+                             headers={"Retry-After": "5"})
+
+    def reserve(self, slots: int) -> PoolReservation:
+        """
+        Reserva slots cupos para un lote, o responde 429 si no caben. Los trabajos del lote se
+        ejecutan con run(..., reservation=...) y hay que llamar a release cuando el lote termina.
+        """
+        if self.pending + self.reserved + slots > self.max_pending:
+            raise self._saturated()
+        self.reserved += slots
+        return PoolReservation(self, slots)
+
+    async def run(self, fn, *args, timeout: float = None, wait: bool = False,
+                  reservation: PoolReservation = None):
+        """
+        Ejecuta fn(*args) en el pool. Con wait=True no se aplica el límite de pendientes:
+        el llamador (p. ej. los trabajos asíncronos) controla su propia concurrencia. Con
+        reservation el trabajo usa un cupo libre de la reserva; si no queda ninguno (p. ej. porque
+        un trabajo del lote superó el tiempo y sigue corriendo) se aplica el límite normal.
+        """
+        if reservation is not None and not reservation.take():
+            reservation = None
+        if reservation is None and not wait and self.pending + self.reserved >= self.max_pending:
+            raise self._saturated()
+
+        executor = self.executor
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            if reservation:
+                reservation.give_back()
+            self._rebuild(executor)
+            raise self._unavailable()
+        self.pending += 1
+        self._release_when_done(future, asyncio.get_running_loop(), reservation)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # Un trabajo que ya empezó no se puede interrumpir; solo se deja de esperar su resultado
+            raise HTTPException(status_code=504, detail="El procesamiento del archivo tardó demasiado.")
+        except BrokenProcessPool:
+            self._rebuild(executor)
+            raise self._unavailable()
+
+    @staticmethod
+    def _unavailable() -> HTTPException:
+        return HTTPException(status_code=503, detail="El procesamiento del archivo falló, intenta de nuevo.",
+                             headers={"Retry-After": "5"})
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+media_pool: MediaPool = None
+
+
+def start_media_pool():
+    global media_pool
+    media_pool = MediaPool(MEDIA_WORKERS, MEDIA_MAX_PENDING, MEDIA_JOB_TIMEOUT)
+    print(f"Pool de medios iniciado con {MEDIA_WORKERS} procesos")
+
+
+async def prewarm_media_pool():
+    """
+    Arranca todos los procesos del pool y carga en ellos las librerías de medios. Cada trabajo
+    tarda lo que tarda la importación, así que los procesos se los reparten en lugar de tomarlos uno solo.
+    """
+    from service import media_tasks
+
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(media_pool.executor, media_tasks.prewarm)
+                           for _ in range(media_pool.workers)))
+    print("Pool de medios precalentado")
+
+
+def stop_media_pool():
+    global media_pool
+    if media_pool:
+        media_pool.shutdown()
+        media_pool = None
+        print("Pool de medios detenido")
+
+
+def get_media_pool() -> MediaPool:
+    return media_pool
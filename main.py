@@ -1,12 +1,33 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from contextlib import asynccontextmanager
-from config.database import mongo_connect, mongo_disconnect
-from routes import video_routes, multimedia_routes
+from config.database import mongo_connect, mongo_disconnect, get_database, ensure_indexes, mongo_settings, \
+    pool_metrics
+from config.media import MEDIA_PREWARM
+from config.media_pool import start_media_pool, stop_media_pool, get_media_pool, prewarm_media_pool
+from service.job_service import start_job_runners, stop_job_runners
+from service.view_counter import view_counter
+from service.video_stats import video_stats
+from service.video_cache import video_cache
+from util.metrics import MetricsMiddleware, register_runtime_gauges
+from routes import video_routes, multimedia_routes, stats_routes
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await mongo_connect()
+    await ensure_indexes()
+    view_counter.start(get_database()["videos"].with_options(write_concern=mongo_settings.write_concern()))
+    video_stats.start(get_database()["videos"], get_database()["uploader_stats"])
+    start_media_pool()
+    if MEDIA_PREWARM:
+        await prewarm_media_pool()
+    start_job_runners()
     yield
+    await stop_job_runners()
+    await video_stats.stop()
+    stop_media_pool()
+    # Guarda las vistas pendientes antes de cerrar la conexión
+    await view_counter.stop()
     await mongo_disconnect()
 
 app = FastAPI(
@@ -18,10 +39,31 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(MetricsMiddleware)
+register_runtime_gauges(video_cache, view_counter, pool_metrics, get_media_pool)
+
 app.include_router(video_routes.router, prefix="/api/v1/videos", tags=["Videos"])
 
 app.include_router(multimedia_routes.router, prefix="/api/v1/share", tags=["Share"])
 
+app.include_router(stats_routes.router, prefix="/api/v1/stats", tags=["Stats"])
+
 @app.get("/")
 async def root():
-    return {"message": "Bienvenido a la API de prueba. Visita /docs para la documentación interactiva."}
\ No newline at end of file
+    return {"message": "Bienvenido a la API de prueba. Visita /docs para la documentación interactiva."}
+
+
+@app.get("/health/mongo", tags=["Health"])
+async def mongo_pool_stats():
+    """
+    Configuración del pool de conexiones a MongoDB de este worker y sus métricas actuales.
+    """
+    return {"settings": mongo_settings.model_dump(), "pool": pool_metrics.stats()}
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencia por ruta, tiempos por etapa de medios y Mongo.
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
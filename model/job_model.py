@@ -0,0 +1,36 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class JobOperation(str, Enum):
+    hide = "hide"
+    reveal = "reveal"
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+# Entity
+class JobInDB(BaseModel):
+    job_id: UUID = Field(..., description="UUID público del trabajo.")
+    operation: JobOperation = Field(..., description="Operación: ocultar (hide) o extraer (reveal) la URL.")
+    status: JobStatus = Field(default=JobStatus.queued, description="Estado actual del trabajo.")
+    filename: str = Field(..., description="Nombre del archivo subido.")
+    frames_processed: int = Field(default=0, ge=0, description="Frames procesados hasta el momento.")
+    error: Optional[str] = Field(None, description="Detalle del error si el trabajo falló.")
+    video_uuid: Optional[UUID] = Field(None, description="UUID del video encontrado (solo reveal).")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="Fecha de creación del trabajo.")
+    updated_at: datetime = Field(default_factory=datetime.utcnow, description="Fecha de la última actualización.")
+
+    class Config:
+        json_encoders = {
+            UUID: str
+        }
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional
 from uuid import UUID, uuid4
 
 from bson import ObjectId
@@ -63,4 +64,40 @@ class VideoUpdate(BaseModel):
         json_encoders = {
             ObjectId: str,
             UUID: str
-        }
\ No newline at end of file
+        }
+
+# DTO
+class VideoPage(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., description="Videos de la página, solo con los campos solicitados.")
+    next_cursor: Optional[str] = Field(None, description="Cursor opaco para pedir la siguiente página; nulo si no hay más.")
+
+# DTO
+class BulkItemError(BaseModel):
+    index: int = Field(..., description="Posición del elemento en la solicitud.")
+    detail: Any = Field(..., description="Motivo por el que no se procesó el elemento.")
+
+# DTO
+class VideoBulkCreateResult(BaseModel):
+    created: List[VideoInDB] = Field(..., description="Videos creados.")
+    errors: List[BulkItemError] = Field(..., description="Elementos que no se pudieron crear.")
+
+# DTO
+class VideoUUIDList(BaseModel):
+    video_uuids: List[UUID] = Field(..., min_length=1, max_length=1000, description="UUIDs de los videos.")
+
+# DTO
+class VideoLookupResult(BaseModel):
+    videos: List[VideoInDB] = Field(..., description="Videos encontrados.")
+    missing: List[UUID] = Field(..., description="UUIDs que no existen.")
+
+# DTO
+class UploaderStats(BaseModel):
+    uploader_username: str = Field(..., description="Nombre de usuario.")
+    video_count: int = Field(..., description="Cantidad de videos subidos.")
+    total_views: int = Field(..., description="Suma de las vistas de sus videos.")
+    average_rating: float = Field(..., description="Promedio de rating_stars de sus videos.")
+
+
+class UploaderSort(str, Enum):
+    total_views = "total_views"
+    video_count = "video_count"
@@ -1,16 +1,31 @@
+import hashlib
+import json
+import os
 import re
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from contextlib import AsyncExitStack
+from typing import List, Optional
+from uuid import UUID, uuid4
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Header, Response
 from fastapi.params import Body
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from service.multimedia_service import ImageSteganographyService
+from service.media_tasks import output_extension, output_media_type
+from service.result_cache import result_cache
+from config.media_pool import PoolReservation, get_media_pool
+from util.media_io import spool_upload, new_temp_path, remove_file, stream_file_response, iter_zip
 from service.video_service import VideoService
+from service.job_service import JobService, notify_job_runners
 from model.video_model import VideoInDB
+from model.job_model import JobInDB, JobOperation, JobStatus
 
 router = APIRouter()
 
+BATCH_MAX_FILES = 100
+
 
 async def get_image_steganography_service():
-    return ImageSteganographyService()
+    return ImageSteganographyService(get_media_pool(), cache=result_cache)
 
 
 from config.database import get_database
@@ -23,25 +38,122 @@ async def get_video_service_for_image_route():
 
 @router.post("/share_video",
              summary="Compartir URL de video en imagen, GIF o video",
-             response_description="El archivo con la URL del video dentro (PNG).",
+             response_description="El archivo con la URL del video dentro.",
+             response_class=StreamingResponse,
              responses={
-                 200: {"description": "Retorna el archivo encriptado."},
-                 400: {"description": "Solicitud inválida."},
+                 200: {"description": "Retorna el archivo encriptado. X-Cache indica si vino del caché."},
+                 206: {"description": "Retorna el rango de bytes solicitado del archivo encriptado."},
+                 400: {"description": "Solicitud inválida o el mensaje no cabe en el archivo."},
+                 413: {"description": "El archivo o sus frames son demasiado grandes."},
+                 429: {"description": "Servidor ocupado, intenta más tarde."},
                  500: {"description": "Error interno del servidor."}
              }
              )
 async def encrypt_file_route(
         file: UploadFile = File(..., description="El archivo (imagen, GIF o video) a incrustar el mensaje."),
         video_url: str = "http://localhost:8000/api/v1/videos/d6dce7a2-47e9-44b5-801d-0879e59ec068",
-        steg_service: ImageSteganographyService = Depends(get_image_steganography_service)
+        steg_service: ImageSteganographyService = Depends(get_image_steganography_service),
+        range_header: Optional[str] = Header(None, alias="Range", include_in_schema=False)
 ):
     if not file.content_type.startswith(('image/', 'video/')):
         raise HTTPException(status_code=400, detail="Formato de archivo no soportado.")
 
-    file_bytes = await file.read()
-    modified_file_bytes = await steg_service.hide_url(file_bytes, file.filename, video_url)
+    extension = output_extension(file.filename)
+    digest = hashlib.sha256()
+    async with spool_upload(file, digest=digest) as input_path:
+        # El archivo de salida vive hasta que termina de enviarse la respuesta
+        output_path = new_temp_path(extension)
+        try:
+            await steg_service.hide_url(input_path, output_path, file.filename, video_url,
+                                        content_hash=digest.hexdigest())
+        except Exception:
+            remove_file(output_path)
+            raise
+
+    download_name = os.path.splitext(os.path.basename(file.filename))[0] + extension
+    headers = {"X-Cache": steg_service.cache_status} if steg_service.cache_status else None
+    return stream_file_response(output_path, output_media_type(file.filename), download_name, range_header,
+                                extra_headers=headers)
+
 
-    return Response(content=modified_file_bytes, media_type=file.content_type)
+async def _batch_entries(steg_service: ImageSteganographyService, items: list, names: list, manifest: list,
+                         message: str, reservation: Optional[PoolReservation], stack: AsyncExitStack):
+    """Entradas del ZIP del lote a medida que termina cada archivo, y al final el manifest.json."""
+    try:
+        async for index, error, cache_status in steg_service.hide_url_many([item for _, item in items], message,
+                                                                            reservation):
+            position, (_, output_path, _, _) = items[index]
+            if error:
+                manifest[position].update(status=error.status_code, detail=str(error.detail))
+                continue
+            manifest[position].update(status=200, entry=names[position], cache=cache_status)
+            yield names[position], output_path
+        yield "manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode()
+    finally:
+        await stack.aclose()
+
+
+@router.post("/share_video/batch",
+             summary="Compartir la misma URL de video en varios archivos",
+             response_description="Un ZIP con los archivos con la URL dentro y un manifest.json.",
+             response_class=StreamingResponse,
+             responses={
+                 200: {"description": "ZIP con cada archivo procesado y manifest.json con el resultado de cada uno."},
+                 400: {"description": "Solicitud inválida."},
+                 429: {"description": "Servidor ocupado, intenta más tarde."}
+             }
+             )
+async def encrypt_files_batch_route(
+        files: List[UploadFile] = File(..., description="Los archivos (imágenes, GIFs o videos) a incrustar."),
+        video_url: str = "http://localhost:8000/api/v1/videos/d6dce7a2-47e9-44b5-801d-0879e59ec068",
+        steg_service: ImageSteganographyService = Depends(get_image_steganography_service)
+):
+    """
+    Este endpoint incrusta la misma URL en todos los archivos, procesándolos en paralelo.
+
+    El ZIP se envía a medida que termina cada archivo, en el orden en que terminan. Un archivo
+    que falla no detiene al resto: **manifest.json** (la última entrada) indica para cada archivo
+    su estado HTTP, el error si lo hubo y el nombre de su entrada en el ZIP.
+    """
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Se permiten como máximo {BATCH_MAX_FILES} archivos por lote.")
+    steg_service.check_message(video_url)
+
+    manifest = [{"filename": file.filename, "status": None, "entry": None} for file in files]
+    names, items = [], []
+    # Los temporales y los cupos del pool viven hasta que termina de enviarse el ZIP
+    stack = AsyncExitStack()
+    try:
+        # Sin cupos responde 429 antes de copiar los archivos
+        reservation = steg_service.reserve_batch(len(files))
+        if reservation:
+            stack.callback(reservation.release)
+        for position, file in enumerate(files):
+            stem = os.path.splitext(os.path.basename(file.filename or "archivo"))[0]
+            names.append(f"{position + 1:03d}_{stem}{output_extension(file.filename or '')}")
+            if not (file.content_type or "").startswith(('image/', 'video/')):
+                manifest[position].update(status=400, detail="Formato de archivo no soportado.")
+                continue
+
+            digest = hashlib.sha256()
+            try:
+                input_path = await stack.enter_async_context(spool_upload(file, digest=digest))
+            except HTTPException as e:
+                manifest[position].update(status=e.status_code, detail=str(e.detail))
+                continue
+            output_path = new_temp_path(output_extension(file.filename))
+            stack.callback(remove_file, output_path)
+            items.append((position, (input_path, output_path, file.filename, digest.hexdigest())))
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    entries = _batch_entries(steg_service, items, names, manifest, video_url, reservation, stack)
+    # Si el cliente se desconecta antes de que empiece el envío el generador nunca corre; la tarea
+    # de fondo cierra igual los temporales (cerrar la pila dos veces no hace nada)
+    return StreamingResponse(iter_zip(entries), media_type="application/zip",
+                             headers={"Content-Disposition": 'attachment; filename="share_batch.zip"'},
+                             background=BackgroundTask(stack.aclose))
 
 
 @router.post("/get_video",
@@ -51,10 +163,13 @@ async def encrypt_file_route(
              responses={
                  400: {"description": "Solicitud inválida."},
                  404: {"description": "No se encontró mensaje o video."},
+                 413: {"description": "El archivo o sus frames son demasiado grandes."},
+                 429: {"description": "Servidor ocupado, intenta más tarde."},
                  500: {"description": "Error interno del servidor."}
              }
              )
 async def decrypt_image_route(
+        response: Response,
         file: UploadFile = File(..., description="El archivo que contiene la URL del video oculta."),
         steg_service: ImageSteganographyService = Depends(get_image_steganography_service),
         video_service: VideoService = Depends(get_video_service_for_image_route)
@@ -70,7 +185,99 @@ async def decrypt_image_route(
     if not file.content_type.startswith(('image/', 'video/')):
         raise HTTPException(status_code=400, detail="Formato de archivo no soportado.")
 
-    file_bytes = await file.read()
-    video_data = await steg_service.obtain_url(file_bytes, file.filename, video_service)
+    digest = hashlib.sha256()
+    async with spool_upload(file, digest=digest) as input_path:
+        video_data = await steg_service.obtain_url(input_path, file.filename, video_service,
+                                                   content_hash=digest.hexdigest())
 
+    if steg_service.cache_status:
+        response.headers["X-Cache"] = steg_service.cache_status
     return video_data
+
+
+async def get_job_service():
+    db = get_database()
+    return JobService(db["jobs"])
+
+
+@router.post("/jobs",
+             summary="Crear un trabajo asíncrono de ocultar o extraer una URL",
+             response_description="El trabajo creado, en cola.",
+             response_model=JobInDB,
+             status_code=202,
+             responses={
+                 400: {"description": "Solicitud inválida o el mensaje no cabe en el archivo."},
+                 404: {"description": "El archivo no tiene capacidad para un mensaje."},
+                 413: {"description": "El archivo o sus frames son demasiado grandes."}
+             }
+             )
+async def create_job_route(
+        file: UploadFile = File(..., description="El archivo (imagen, GIF o video) a procesar."),
+        operation: JobOperation = JobOperation.hide,
+        video_url: Optional[str] = None,
+        job_service: JobService = Depends(get_job_service),
+        steg_service: ImageSteganographyService = Depends(get_image_steganography_service)
+):
+    """
+    Este endpoint encola el procesamiento de archivos grandes y retorna de inmediato el id del trabajo.
+    El estado se consulta en **/jobs/{job_id}** y el resultado en **/jobs/{job_id}/result**.
+    """
+    if not file.content_type.startswith(('image/', 'video/')):
+        raise HTTPException(status_code=400, detail="Formato de archivo no soportado.")
+    if operation == JobOperation.hide:
+        steg_service.check_message(video_url)
+
+    async with spool_upload(file) as upload_path:
+        # Un archivo inválido o sin capacidad se rechaza aquí y no como un trabajo fallido
+        await steg_service.preflight(upload_path, file.filename,
+                                     video_url if operation == JobOperation.hide else None)
+        job = await job_service.create_job(uuid4(), operation, file.filename, upload_path, video_url)
+
+    notify_job_runners()
+    return job
+
+
+@router.get("/jobs/{job_id}",
+            summary="Consultar el estado de un trabajo",
+            response_description="Estado y progreso del trabajo.",
+            response_model=JobInDB
+            )
+async def get_job_route(
+        job_id: UUID,
+        job_service: JobService = Depends(get_job_service)
+):
+    job = await job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    return job
+
+
+@router.get("/jobs/{job_id}/result",
+            summary="Obtener el resultado de un trabajo",
+            response_description="El archivo con la URL (hide) o los metadatos del video (reveal).",
+            responses={
+                404: {"description": "Trabajo o video no encontrado."},
+                409: {"description": "El trabajo aún no termina o falló."}
+            }
+            )
+async def get_job_result_route(
+        job_id: UUID,
+        job_service: JobService = Depends(get_job_service),
+        video_service: VideoService = Depends(get_video_service_for_image_route),
+        range_header: Optional[str] = Header(None, alias="Range", include_in_schema=False)
+):
+    job = await job_service.get_job_document(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    if job['status'] != JobStatus.done:
+        raise HTTPException(status_code=409, detail=f"El trabajo está en estado '{job['status']}'.")
+
+    if job['operation'] == JobOperation.reveal:
+        video = await video_service.get_video_by_uuid(UUID(job['video_uuid']))
+        if not video:
+            raise HTTPException(status_code=404, detail="Video no encontrado.")
+        return video
+
+    download_name = os.path.splitext(os.path.basename(job['filename']))[0] + output_extension(job['filename'])
+    return stream_file_response(job['output_path'], job['media_type'], download_name, range_header,
+                                delete_after=False)
@@ -0,0 +1,101 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+
+from model.video_model import VideoInDB, UploaderSort, UploaderStats
+from routes.video_routes import get_video_service
+from service.video_service import VideoService
+from service.video_stats import VideoStats, video_stats
+
+router = APIRouter()
+
+STATS_MAX_LIMIT = 100
+
+
+async def get_video_stats():
+    return video_stats
+
+
+@router.get("/videos/top",
+            summary="Videos más vistos",
+            response_description="Los videos con más vistas, de mayor a menor.",
+            response_model=List[VideoInDB]
+            )
+async def get_top_videos_route(
+        limit: int = Query(10, ge=1, le=STATS_MAX_LIMIT),
+        video_service: VideoService = Depends(get_video_service)
+):
+    """
+    Este endpoint retorna los videos más vistos leyendo solo el índice de vistas.
+    El orden usa las vistas ya guardadas; las de los últimos segundos pueden no reflejarse aún.
+    """
+    return await video_service.get_top_videos(limit)
+
+
+@router.get("/videos/recent",
+            summary="Videos más recientes",
+            response_description="Los últimos videos subidos, del más reciente al más antiguo.",
+            response_model=List[VideoInDB]
+            )
+async def get_recent_videos_route(
+        limit: int = Query(10, ge=1, le=STATS_MAX_LIMIT),
+        video_service: VideoService = Depends(get_video_service)
+):
+    return await video_service.get_recent_videos(limit)
+
+
+@router.get("/uploaders",
+            summary="Ranking de uploaders",
+            response_description="Totales por uploader, ordenados por el campo pedido.",
+            response_model=List[UploaderStats]
+            )
+async def get_top_uploaders_route(
+        sort: UploaderSort = UploaderSort.total_views,
+        limit: int = Query(10, ge=1, le=STATS_MAX_LIMIT),
+        stats: VideoStats = Depends(get_video_stats)
+):
+    """
+    Este endpoint retorna cantidad de videos, vistas totales y calificación promedio por uploader,
+    desde el resumen materializado.
+
+    - **sort**: `total_views` (por defecto) o `video_count`.
+    """
+    return await stats.top_uploaders(sort, limit)
+
+
+@router.get("/uploaders/{uploader_username}",
+            summary="Totales de un uploader",
+            response_description="Cantidad de videos, vistas totales y calificación promedio del uploader.",
+            response_model=UploaderStats
+            )
+async def get_uploader_stats_route(
+        uploader_username: str,
+        stats: VideoStats = Depends(get_video_stats)
+):
+    uploader = await stats.get_uploader(uploader_username)
+    if not uploader:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Uploader no encontrado.")
+    return uploader
+
+
+@router.post("/refresh",
+             summary="Recalcular el resumen de uploaders",
+             response_description="Cantidad de uploaders y fecha del recálculo.",
+             responses={409: {"description": "Otro worker está recalculando el resumen."}}
+             )
+async def refresh_stats_route(
+        stats: VideoStats = Depends(get_video_stats)
+):
+    """
+    Este endpoint recalcula el resumen completo agrupando la colección de videos. Normalmente no
+    hace falta: el resumen se actualiza con cada escritura y se recalcula periódicamente
+    (STATS_REFRESH_INTERVAL). Responde 409 si otro worker está recalculando.
+    """
+    try:
+        uploaders = await stats.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Error al recalcular el resumen: {e}")
+    if uploaders is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ya hay un recálculo en curso.")
+    return {"uploaders": uploaders, "refreshed_at": stats.last_refresh}
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Body, HTTPException, Depends, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from service.video_service import VideoService
-from model.video_model import VideoCreate, VideoInDB, VideoUpdate
+from service.video_cache import video_cache
+from model.video_model import VideoCreate, VideoInDB, VideoUpdate, VideoPage, BulkItemError, \
+    VideoBulkCreateResult, VideoUUIDList, VideoLookupResult
+from pydantic import TypeAdapter, ValidationError
 from config.database import get_database
-from typing import List
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
 router = APIRouter()
 
+BULK_MAX_ITEMS = 5000
+
+_video_create = TypeAdapter(VideoCreate)
+
 async def get_video_service():
     db = get_database()
     return VideoService(db["videos"])
@@ -34,22 +41,146 @@ async def create_video_route(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al crear el video: {e}")
 
 
+@router.post("/bulk",
+             summary="Crear muchos videos en una sola solicitud",
+             response_description="Los videos creados y los errores por elemento.",
+             response_model=VideoBulkCreateResult
+             )
+async def create_videos_bulk_route(
+        videos_data: List[Dict[str, Any]] = Body(..., max_length=BULK_MAX_ITEMS),
+        video_service: VideoService = Depends(get_video_service)
+):
+    """
+    Este endpoint registra un lote de videos con una sola inserción.
+    Los elementos inválidos o que no se pudieron insertar se reportan en **errors** con su posición;
+    el resto del lote se crea igual.
+    """
+    errors = {}
+    videos = []
+    valid_indices = []
+    # Cada elemento se valida una sola vez y los válidos se insertan tal cual
+    for index, video_data in enumerate(videos_data):
+        try:
+            videos.append(_video_create.validate_python(video_data))
+        except ValidationError as e:
+            errors[index] = [{"loc": error['loc'], "msg": error['msg']}
+                             for error in e.errors(include_url=False, include_context=False)]
+            continue
+        valid_indices.append(index)
+
+    try:
+        created, insert_errors = await video_service.create_videos(videos)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al crear los videos: {e}")
+
+    for index, detail in insert_errors.items():
+        errors[valid_indices[index]] = detail
+
+    return VideoBulkCreateResult(
+        created=created,
+        errors=[BulkItemError(index=index, detail=detail) for index, detail in sorted(errors.items())]
+    )
+
+
+@router.post("/lookup",
+             summary="Obtener muchos videos por UUID",
+             response_description="Los videos encontrados y los UUIDs inexistentes.",
+             response_model=VideoLookupResult
+             )
+async def lookup_videos_route(
+        lookup: VideoUUIDList,
+        video_service: VideoService = Depends(get_video_service)
+):
+    """
+    Este endpoint retorna los metadatos de varios videos con una sola consulta.
+    No incrementa el contador de vistas.
+    """
+    videos = await video_service.get_videos_by_uuids(lookup.video_uuids)
+    found = {video.video_uuid for video in videos}
+    return VideoLookupResult(videos=videos, missing=[u for u in dict.fromkeys(lookup.video_uuids) if u not in found])
+
+
+@router.post("/bulk/delete",
+             summary="Eliminar muchos videos por UUID",
+             response_description="Cantidad de videos eliminados."
+             )
+async def delete_videos_bulk_route(
+        lookup: VideoUUIDList,
+        video_service: VideoService = Depends(get_video_service)
+):
+    """
+    Este endpoint elimina varios videos con una sola operación.
+    """
+    deleted_count = await video_service.delete_videos(lookup.video_uuids)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"deleted_count": deleted_count})
+
+
 @router.get("/",
             summary="Listar todos los videos",
-            response_description="Lista de los videos.",
-            response_model=List[VideoInDB]
+            response_description="Lista de los videos, o una página con cursor en modo keyset.",
+            response_model=Union[List[VideoInDB], VideoPage]
             )
 async def get_all_videos_route(
-        skip: int = 0, limit: int = 100,
+        skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+        keyset: bool = False,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
         video_service: VideoService = Depends(get_video_service)
 ):
     """
     Este endpoint retorna una lista paginada de todos los videos registrados.
+
+    - **skip/limit**: paginación por desplazamiento (por defecto).
+    - **keyset/cursor**: con `keyset=true` (o al enviar un `cursor`) retorna `{items, next_cursor}`,
+      ordenado del más reciente al más antiguo; `next_cursor` se envía en la siguiente solicitud.
+    - **fields**: en modo keyset, lista separada por comas de los campos a incluir (p. ej. `title,views`).
     """
+    if keyset or cursor:
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        try:
+            items, next_cursor = await video_service.get_videos_page(cursor=cursor, limit=limit, fields=field_list)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return VideoPage(items=items, next_cursor=next_cursor)
+
     videos = await video_service.get_all_videos(skip=skip, limit=limit)
     return videos
 
 
+@router.get("/export",
+            summary="Exportar el catálogo completo como NDJSON",
+            response_description="Un video por línea, en orden de creación.",
+            response_class=StreamingResponse,
+            responses={200: {"content": {"application/x-ndjson": {}}}}
+            )
+async def export_videos_route(
+        fields: Optional[str] = None,
+        batch_size: int = Query(1000, ge=1, le=10000),
+        video_service: VideoService = Depends(get_video_service)
+):
+    """
+    Este endpoint envía todos los videos como NDJSON a medida que se leen de la base de datos,
+    sin armar la lista completa en memoria. Pensado para sincronizar catálogos grandes.
+
+    - **fields**: lista separada por comas de los campos a incluir (p. ej. `video_uuid,title,views`).
+    - **batch_size**: documentos por lote leído de Mongo y por bloque enviado.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        lines = video_service.export_videos(fields=field_list, batch_size=batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats",
+            summary="Estadísticas del caché de videos",
+            response_description="Aciertos, fallos y tamaño del caché en este worker."
+            )
+async def get_cache_stats_route():
+    return video_cache.stats()
+
+
 @router.get("/{video_uuid}",
             summary="Obtener un video por UUID",
             response_description="Metadatos del video.",
@@ -63,13 +194,9 @@ async def get_video_by_uuid_route(
     Este endpoint retorna los datos de un video específico usando su UUID.
     Incrementa el contador de vistas cada vez que se accede.
     """
-    video = await video_service.get_video_by_uuid(video_uuid)
-    if not video:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video no encontrado.")
-
     updated_video = await video_service.increment_views(video_uuid)
     if not updated_video:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error al incrementar vistas.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video no encontrado.")
 
     return updated_video
 
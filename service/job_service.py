@@ -0,0 +1,218 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+from config.database import get_database
+from config.media_pool import get_media_pool
+from model.job_model import JobInDB, JobOperation, JobStatus
+from service.media_tasks import output_extension, output_media_type, read_progress
+from service.multimedia_service import ImageSteganographyService
+from service.video_service import VideoService
+from util.media_io import remove_file
+
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(tempfile.gettempdir(), "share_jobs"))
+JOB_RUNNERS = int(os.environ.get("JOB_RUNNERS", 2))
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", 3600))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 5))
+# Un trabajo en curso cuyo runner deja de renovar el lease (worker caído) vuelve a la cola al vencer
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", 60))
+# Intentos antes de marcar como fallido un trabajo que tumba a su worker cada vez
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# Tiempo que se conservan los trabajos terminados y sus archivos; 0 los conserva siempre
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", 24 * 3600))
+JOB_SWEEP_INTERVAL = float(os.environ.get("JOB_SWEEP_INTERVAL", 600))
+
+
+class JobService:
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    @staticmethod
+    def job_dir(job_id: UUID) -> str:
+        return os.path.join(JOBS_DIR, str(job_id))
+
+    async def create_job(self, job_id: UUID, operation: JobOperation, filename: str, upload_path: str,
+                         video_url: Optional[str] = None) -> JobInDB:
+        """Mueve el archivo subido al directorio del trabajo y lo deja en cola."""
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        input_path = os.path.join(job_dir, "input" + os.path.splitext(filename)[1].lower())
+        shutil.move(upload_path, input_path)
+
+        job = JobInDB(job_id=job_id, operation=operation, filename=filename)
+        job_dict = job.model_dump()
+        job_dict.update({
+            'job_id': str(job_id),
+            'video_url': video_url,
+            'input_path': input_path,
+            'output_path': os.path.join(job_dir, "output" + output_extension(filename)),
+            'progress_path': os.path.join(job_dir, "progress"),
+            'media_type': output_media_type(filename),
+        })
+        await self.collection.insert_one(job_dict)
+        return job
+
+    async def get_job_document(self, job_id: UUID) -> Optional[dict]:
+        return await self.collection.find_one({'job_id': str(job_id)})
+
+    async def get_job(self, job_id: UUID) -> Optional[JobInDB]:
+        job = await self.get_job_document(job_id)
+        if not job:
+            return None
+        if job['status'] == JobStatus.running:
+            # El progreso en curso lo escribe el proceso del pool en disco
+            job['frames_processed'] = read_progress(job['progress_path'])
+        return JobInDB(**job)
+
+    async def claim_next(self) -> Optional[dict]:
+        """
+        Toma atómicamente el trabajo en cola más antiguo, o uno en curso cuyo lease venció;
+        varios runners pueden competir sin duplicar. El runner queda como dueño del lease.
+        """
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {'$or': [
+                {'status': JobStatus.queued},
+                {'status': JobStatus.running, 'lease_expires_at': {'$lt': now}},
+                # Trabajos que quedaron en curso antes de que existiera el lease
+                {'status': JobStatus.running, 'lease_expires_at': {'$exists': False}},
+            ]},
+            {'$set': {'status': JobStatus.running, 'updated_at': now, 'lease_owner': str(uuid.uuid4()),
+                      'lease_expires_at': now + timedelta(seconds=JOB_LEASE_SECONDS)},
+             '$inc': {'attempts': 1}},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _owned(self, job: dict) -> dict:
+        # Si el lease venció y otro runner tomó el trabajo, este ya no puede escribir su estado
+        return {'job_id': job['job_id'], 'lease_owner': job['lease_owner']}
+
+    async def _renew_lease(self, job: dict):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await self.collection.update_one(self._owned(job), {
+                    '$set': {'lease_expires_at': datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)}})
+            except Exception as e:
+                print(f"No se pudo renovar el lease del trabajo {job['job_id']}: {e}")
+
+    async def process(self, job: dict, video_service: VideoService):
+        if job['attempts'] > JOB_MAX_ATTEMPTS:
+            await self._finish(job, {'status': JobStatus.failed,
+                                     'error': "El trabajo se interrumpió demasiadas veces al procesarse."})
+            return
+
+        steg_service = ImageSteganographyService(get_media_pool(), timeout=JOB_TIMEOUT, wait=True)
+        update = {'status': JobStatus.done}
+        heartbeat = asyncio.create_task(self._renew_lease(job))
+        try:
+            if job['operation'] == JobOperation.hide:
+                await steg_service.hide_url(job['input_path'], job['output_path'], job['filename'],
+                                            job['video_url'], job['progress_path'])
+            else:
+                video = await steg_service.obtain_url(job['input_path'], job['filename'], video_service,
+                                                      job['progress_path'])
+                update['video_uuid'] = str(video.video_uuid)
+        except HTTPException as e:
+            update = {'status': JobStatus.failed, 'error': str(e.detail)}
+        except asyncio.CancelledError:
+            # Apagado del worker: el trabajo vuelve a la cola con su archivo, sin contar el intento
+            await self.collection.update_one(self._owned(job), {
+                '$set': {'status': JobStatus.queued, 'updated_at': datetime.utcnow()},
+                '$unset': {'lease_owner': "", 'lease_expires_at': ""},
+                '$inc': {'attempts': -1}})
+            raise
+        except Exception as e:
+            update = {'status': JobStatus.failed, 'error': f"Error interno del servidor: {e}"}
+        finally:
+            heartbeat.cancel()
+
+        await self._finish(job, update)
+
+    async def _finish(self, job: dict, update: dict):
+        """Escribe el estado final y solo después borra la entrada, que ya no se necesita."""
+        update['frames_processed'] = read_progress(job['progress_path'])
+        update['updated_at'] = datetime.utcnow()
+        result = await self.collection.update_one(self._owned(job), {
+            '$set': update, '$unset': {'lease_owner': "", 'lease_expires_at': ""}})
+        if result.modified_count:
+            remove_file(job['input_path'])
+
+    async def sweep_finished(self, ttl: float = JOB_RESULT_TTL) -> int:
+        """Borra los trabajos terminados hace más de ttl segundos junto con sus archivos."""
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        expired = {'status': {'$in': [JobStatus.done, JobStatus.failed]}, 'updated_at': {'$lt': cutoff}}
+        job_ids = [job['job_id'] async for job in self.collection.find(expired, {'job_id': 1})]
+        for job_id in job_ids:
+            await asyncio.to_thread(shutil.rmtree, self.job_dir(job_id), ignore_errors=True)
+        if job_ids:
+            await self.collection.delete_many({'job_id': {'$in': job_ids}})
+        return len(job_ids)
+
+
+_runner_tasks = []
+_wakeup: asyncio.Event = None
+
+
+async def _runner_loop():
+    while True:
+        try:
+            db = get_database()
+            job_service = JobService(db["jobs"])
+            job = await job_service.claim_next()
+            if job is None:
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await job_service.process(job, VideoService(db["videos"]))
+        except Exception as e:
+            # Un error de Mongo pasajero no debe terminar el runner; si el trabajo quedó tomado,
+            # otro runner lo retoma cuando vence su lease
+            print(f"Error en el runner de trabajos: {e}")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+async def _sweep_loop():
+    while True:
+        try:
+            removed = await JobService(get_database()["jobs"]).sweep_finished()
+            if removed:
+                print(f"{removed} trabajos terminados eliminados")
+        except Exception as e:
+            print(f"No se pudieron eliminar los trabajos terminados: {e}")
+        await asyncio.sleep(JOB_SWEEP_INTERVAL)
+
+
+def start_job_runners():
+    global _wakeup
+    _wakeup = asyncio.Event()
+    for _ in range(JOB_RUNNERS):
+        _runner_tasks.append(asyncio.create_task(_runner_loop()))
+    if JOB_RESULT_TTL > 0:
+        _runner_tasks.append(asyncio.create_task(_sweep_loop()))
+    print(f"{JOB_RUNNERS} runners de trabajos iniciados")
+
+
+async def stop_job_runners():
+    for task in _runner_tasks:
+        task.cancel()
+    await asyncio.gather(*_runner_tasks, return_exceptions=True)
+    _runner_tasks.clear()
+
+
+def notify_job_runners():
+    if _wakeup:
+        _wakeup.set()
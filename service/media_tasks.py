@@ -0,0 +1,184 @@
+from typing import Tuple
+
+from config.media import HEADER_VERSION, PNG_COMPRESS_LEVEL, PNG_OPTIMIZE, VIDEO_CODECS, DEFAULT_VIDEO_CODEC
+from util.timing import StageTimer
+
+# Tareas síncronas de esteganografía. Se ejecutan en los procesos del pool de medios,
+# por eso reciben rutas de archivos temporales (no su contenido) y no dependen de FastAPI.
+# numpy, Pillow, imageio y moviepy se importan dentro de las tareas: el proceso principal
+# solo usa las extensiones y opciones de este módulo y no carga esas librerías.
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+GIF_EXTENSIONS = ('.gif',)
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + GIF_EXTENSIONS + VIDEO_EXTENSIONS
+
+# Formatos reales (según util.probe) que se aceptan para cada grupo de extensiones
+CARRIER_FORMATS = (
+    (IMAGE_EXTENSIONS, ('png', 'jpeg')),
+    (GIF_EXTENSIONS, ('gif',)),
+    (VIDEO_EXTENSIONS, ('mp4', 'avi', 'mkv')),
+)
+
+# Cada cuántos frames se actualiza el archivo de progreso
+PROGRESS_EVERY_FRAMES = 25
+
+
+class ProgressFile:
+    """Escribe la cantidad de frames procesados en un archivo que el proceso principal puede leer."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, frames: int, force: bool = False):
+        if force or frames % PROGRESS_EVERY_FRAMES == 0:
+            with open(self.path, "w") as f:
+                f.write(str(frames))
+
+
+def read_progress(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _counting_frames(frames, progress: ProgressFile):
+    count = 0
+    try:
+        for count, frame in enumerate(frames, start=1):
+            progress(count)
+            yield frame
+    finally:
+        # También al cerrarse el generador, cuando la extracción termina antes del último frame
+        progress(count, force=True)
+
+
+def accepts_format(filename: str, format: str) -> bool:
+    name = filename.lower()
+    return any(name.endswith(extensions) and format in formats for extensions, formats in CARRIER_FORMATS)
+
+
+def output_extension(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(IMAGE_EXTENSIONS):
+        return '.png'
+    elif name.endswith(GIF_EXTENSIONS):
+        return '.gif'
+    return VIDEO_CODECS[DEFAULT_VIDEO_CODEC]["extension"]
+
+
+def output_media_type(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(IMAGE_EXTENSIONS):
+        return 'image/png'
+    elif name.endswith(GIF_EXTENSIONS):
+        return 'image/gif'
+    return VIDEO_CODECS[DEFAULT_VIDEO_CODEC]["media_type"]
+
+
+def output_options(filename: str) -> str:
+    """Todo lo que, además del archivo y el mensaje, determina el archivo de salida."""
+    name = filename.lower()
+    if name.endswith(IMAGE_EXTENSIONS):
+        options = f"png:{PNG_COMPRESS_LEVEL}:{PNG_OPTIMIZE}"
+    elif name.endswith(GIF_EXTENSIONS):
+        options = "gif"
+    else:
+        options = f"video:{DEFAULT_VIDEO_CODEC}"
+    return f"v{HEADER_VERSION}:{output_extension(filename)}:{options}"
+
+
+def prewarm():
+    """Carga las librerías de medios en el proceso del pool que la ejecuta."""
+    import imageio
+    import moviepy
+    import util.gif
+    import util.steganography
+    import util.video
+
+
+def hide_file(input_path: str, output_path: str, filename: str, message: str,
+              progress_path: str = None) -> StageTimer:
+    """Escribe en output_path el archivo con el mensaje. Devuelve los tiempos por etapa."""
+    import imageio
+    import numpy as np
+    from PIL import Image
+    from util.gif import hide_message_in_gif
+    from util.steganography import hide_message_image, hide_message_in_frames
+    from util.video import hide_message_in_video
+
+    progress = ProgressFile(progress_path) if progress_path else None
+    timer = StageTimer()
+    name = filename.lower()
+    if name.endswith(IMAGE_EXTENSIONS):
+        with open(input_path, "rb") as f:
+            output_bytes = hide_message_image(f.read(), message, timer)
+        with open(output_path, "wb") as f:
+            f.write(output_bytes)
+        timer.frames = 1
+    elif name.endswith(GIF_EXTENSIONS) and hide_message_in_gif(input_path, output_path, message, timer):
+        if progress:
+            progress(timer.frames, force=True)
+    elif name.endswith(GIF_EXTENSIONS):
+        # El primer frame no alcanza para el mensaje: se usa el modo RGB sobre todos los frames
+        with timer.stage("decode"):
+            gif_image = Image.open(input_path)
+            frames = []
+
+            durations = []
+            for frame in range(0, gif_image.n_frames):
+                gif_image.seek(frame)
+
+                rgb_frame = gif_image.convert('RGB')
+                frames.append(np.array(rgb_frame))
+                durations.append(gif_image.info.get('duration', 100))
+
+        new_frames = hide_message_in_frames(frames, message, timer)
+
+        with timer.stage("encode"):
+            imageio.mimsave(output_path, new_frames, format='GIF', duration=durations)
+        gif_image.close()
+        if progress:
+            progress(len(new_frames), force=True)
+    elif name.endswith(VIDEO_EXTENSIONS):
+        frames = hide_message_in_video(input_path, output_path, message, progress=progress, timer=timer)
+        if progress:
+            progress(frames, force=True)
+    else:
+        raise ValueError("Formato de archivo no soportado.")
+    return timer
+
+
+def reveal_file(input_path: str, filename: str, progress_path: str = None) -> Tuple[str, StageTimer]:
+    """Devuelve el mensaje extraído ("" si no hay) y los tiempos por etapa."""
+    import imageio
+    from moviepy import VideoFileClip
+    from util.gif import reveal_message_from_gif
+    from util.steganography import reveal_message_image, reveal_message_from_frames
+
+    progress = ProgressFile(progress_path) if progress_path else None
+    timer = StageTimer()
+    name = filename.lower()
+    if name.endswith(IMAGE_EXTENSIONS):
+        with open(input_path, "rb") as f:
+            timer.frames = 1
+            return reveal_message_image(f.read(), timer), timer
+    elif name.endswith(GIF_EXTENSIONS):
+        message = reveal_message_from_gif(input_path, timer)
+        if message:
+            return message, timer
+        # El lector decodifica frame por frame; la extracción se detiene al completar el mensaje
+        with imageio.get_reader(input_path, format='GIF') as gif_reader:
+            frames = _counting_frames(gif_reader, progress) if progress else gif_reader
+            return reveal_message_from_frames(frames, timer), timer
+    elif name.endswith(VIDEO_EXTENSIONS):
+        clip = VideoFileClip(input_path, audio=False)
+        try:
+            frames = clip.iter_frames()
+            frames = _counting_frames(frames, progress) if progress else frames
+            return reveal_message_from_frames(frames, timer), timer
+        finally:
+            clip.close()
+    raise ValueError("Formato de archivo no soportado.")
@@ -1,90 +1,170 @@
-import io
+import asyncio
+import os
+from typing import AsyncIterator, List, Optional, Tuple
 from uuid import UUID
 
-import imageio
-import numpy as np
-from moviepy import VideoFileClip, ImageSequenceClip
-from PIL import Image
-from util.steganography import hide_message_image, hide_message_in_frames, reveal_message_image, \
-    reveal_message_from_frames
+from config.media_pool import MediaPool, PoolReservation
+from service.media_tasks import hide_file, reveal_file, output_options, accepts_format, SUPPORTED_EXTENSIONS
+from service.result_cache import ResultCache
+from config.media import MAX_MESSAGE_LENGTH, MAX_FRAME_PIXELS
+from util.metrics import MEDIA_STAGE_LATENCY, RESULT_CACHE_REQUESTS, record_media_job
+from util.probe import CarrierInfo, message_bits, probe_carrier
 import re
 from fastapi import HTTPException
 from service.video_service import VideoService
 from model.video_model import VideoInDB
 
 class ImageSteganographyService:
-    def __init__(self):
-        pass
+    def __init__(self, pool: MediaPool = None, timeout: float = None, wait: bool = False,
+                 cache: ResultCache = None, reservation: PoolReservation = None):
+        # timeout, wait y reservation se pasan al pool; los trabajos asíncronos usan un timeout mayor
+        # y esperan turno, los archivos de un lote usan los cupos reservados para el lote
+        self.pool = pool
+        self.timeout = timeout
+        self.wait = wait
+        self.reservation = reservation
+        self.cache = cache if cache and cache.enabled else None
+        # HIT o MISS de la última operación con caché; el servicio se crea por solicitud
+        self.cache_status = None
+
+    async def _run(self, fn, *args):
+        # Sin pool (scripts, benchmarks) el trabajo se ejecuta en un hilo para no bloquear el event loop
+        if self.pool is None:
+            return await asyncio.to_thread(fn, *args)
+        return await self.pool.run(fn, *args, timeout=self.timeout, wait=self.wait, reservation=self.reservation)
+
+    async def _cache_lookup(self, operation: str, fetch, *args):
+        result = await asyncio.to_thread(fetch, *args)
+        hit = result is not None and result is not False
+        self.cache_status = "HIT" if hit else "MISS"
+        RESULT_CACHE_REQUESTS.labels(operation, self.cache_status.lower()).inc()
+        return result
+
+    @staticmethod
+    async def _cache_store(store, *args):
+        # Un caché lleno o sin permisos no debe hacer fallar la solicitud
+        try:
+            await asyncio.to_thread(store, *args)
+        except OSError as e:
+            print(f"No se pudo guardar el resultado en caché: {e}")
+
+    @staticmethod
+    def check_message(message: str):
+        if not message:
+            raise HTTPException(status_code=400, detail="La url no puede estar vacía.")
+        if len(message) > MAX_MESSAGE_LENGTH:
+            raise HTTPException(status_code=400, detail="La url es demasiado larga.")
+
+    @staticmethod
+    async def preflight(input_path: str, filename: str, message: str = None) -> CarrierInfo:
+        """
+        Revisa el portador leyendo solo sus encabezados, antes de decodificar píxeles: formato real,
+        tamaño de los frames y si cabe el mensaje (o, sin message, al menos un encabezado).
+        """
+        operation = "reveal" if message is None else "hide"
+        needed_bits = message_bits(message or "")
+        with MEDIA_STAGE_LATENCY.labels(operation, "probe").time():
+            try:
+                info = await asyncio.to_thread(probe_carrier, input_path, needed_bits)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if not accepts_format(filename, info.format):
+            raise HTTPException(status_code=400, detail="El contenido del archivo no corresponde a su extensión.")
+        if info.pixels > MAX_FRAME_PIXELS:
+            raise HTTPException(status_code=413,
+                                detail=f"Los frames del archivo superan el máximo de {MAX_FRAME_PIXELS} píxeles.")
+        if info.capacity_bits is not None and info.capacity_bits < needed_bits:
+            if message is None:
+                raise HTTPException(status_code=404, detail="No hay un video o link válido.")
+            raise HTTPException(status_code=400, detail="El mensaje es demasiado largo para este archivo.")
+        return info
 
-    async def hide_url(self, file_bytes: bytes, filename: str, message: str) -> bytes:
+    async def hide_url(self, input_path: str, output_path: str, filename: str, message: str,
+                       progress_path: str = None, content_hash: str = None) -> None:
+        """content_hash (sha256 del archivo) habilita el caché de resultados."""
         try:
-            if not message:
-                raise HTTPException(status_code=400, detail="La url no puede estar vacía.")
-            if len(message) > 5000:
-                raise HTTPException(status_code=400, detail="La url es demasiado larga.")
-
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                return hide_message_image(file_bytes, message)
-            elif filename.lower().endswith('.gif'):
-                gif_image = Image.open(io.BytesIO(file_bytes))
-                frames = []
-
-                durations = []
-                for frame in range(0, gif_image.n_frames):
-                    gif_image.seek(frame)
-
-                    rgb_frame = gif_image.convert('RGB')
-                    frames.append(np.array(rgb_frame))
-                    durations.append(gif_image.info.get('duration', 100))
-
-                new_frames = hide_message_in_frames(frames, message)
-
-                output_buffer = io.BytesIO()
-                imageio.mimsave(output_buffer, new_frames, format='GIF', duration=durations)
-                output_buffer.seek(0)
-                gif_image.close()
-                return output_buffer.getvalue()
-            elif filename.lower().endswith(('.mp4', '.avi', '.mov')):
-                ##TODO: RETURN THE VIDEO IN THE RESPONSE AND IMPROVE THE PERFORMANCE (The swagger is down at the moment it get the response of the endpoint but only with the video)
-                with open("temp_input_video", "wb") as f:
-                    f.write(file_bytes)
-                clip = VideoFileClip("temp_input_video")
-                frames = list(clip.iter_frames())
-
-                new_frames = hide_message_in_frames(frames, message)
-                new_clip = ImageSequenceClip(new_frames, fps=clip.fps)
-                output_buffer = io.BytesIO()
-                new_clip.write_videofile("temp_output_video.mp4", codec="libx264", audio_codec="aac")
-                with open("temp_output_video.mp4", "rb") as f:
-                    output_bytes = f.read()
-                print("si")
-                return output_bytes
-            else:
+            self.check_message(message)
+            if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
                 raise HTTPException(status_code=400, detail="Formato de archivo no soportado.")
+
+            key = None
+            if self.cache and content_hash:
+                key = ResultCache.hide_key(content_hash, message, output_options(filename))
+                if await self._cache_lookup("hide", self.cache.fetch_file, key, output_path):
+                    return
+
+            await self.preflight(input_path, filename, message)
+            timer = await self._run(hide_file, input_path, output_path, filename, message, progress_path)
+            record_media_job("hide", timer, os.path.getsize(input_path), os.path.getsize(output_path))
+            if key:
+                await self._cache_store(self.cache.store_file, key, output_path)
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
+        except HTTPException as e:
+            raise e
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error interno del servidor al encriptar: {e}")
 
-    async def obtain_url(self, file_bytes: bytes, filename: str, video_service: VideoService) -> VideoInDB:
+    def reserve_batch(self, count: int) -> Optional[PoolReservation]:
+        """
+        Reserva en el pool los cupos para procesar un lote de count archivos en paralelo (a lo sumo
+        uno por proceso). Lanza HTTPException 429 si el pool está saturado; None si no hay pool.
+        """
+        if self.pool is None or not count:
+            return None
+        return self.pool.reserve(min(count, self.pool.workers))
+
+    async def hide_url_many(self, items: List[Tuple[str, str, str, Optional[str]]], message: str,
+                            reservation: PoolReservation = None
+                            ) -> AsyncIterator[Tuple[int, Optional[HTTPException], Optional[str]]]:
+        """
+        Oculta el mismo mensaje en varios archivos en paralelo, con a lo sumo tantos en curso
+        como cupos tenga reservation (de reserve_batch). items son (input_path, output_path,
+        filename, content_hash). Entrega (posición, error, estado del caché) a medida que cada
+        archivo termina; un error en un archivo no detiene a los demás.
+        """
+        self.check_message(message)
+        semaphore = asyncio.Semaphore(reservation.slots if reservation else 1)
+
+        async def hide_one(index: int, input_path: str, output_path: str, filename: str, content_hash: str):
+            # Cada archivo usa su propio servicio para no mezclar el estado del caché
+            worker = ImageSteganographyService(self.pool, self.timeout, cache=self.cache, reservation=reservation)
+            async with semaphore:
+                try:
+                    await worker.hide_url(input_path, output_path, filename, message, content_hash=content_hash)
+                except HTTPException as e:
+                    return index, e, None
+            return index, None, worker.cache_status
+
+        tasks = [asyncio.create_task(hide_one(index, *item)) for index, item in enumerate(items)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # Si el cliente se desconecta se dejan de esperar los archivos pendientes
+            for task in tasks:
+                task.cancel()
+
+    async def obtain_url(self, input_path: str, filename: str, video_service: VideoService,
+                         progress_path: str = None, content_hash: str = None) -> VideoInDB:
         try:
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                extracted_url = reveal_message_image(file_bytes)
-            elif filename.lower().endswith('.gif'):
-                gif_reader = imageio.get_reader(io.BytesIO(file_bytes))
-                frames = [frame for frame in gif_reader]
-                extracted_url = reveal_message_from_frames(frames)
-            elif filename.lower().endswith(('.mp4', '.avi', '.mov')):
-                with open("temp_input_video", "wb") as f:
-                    f.write(file_bytes)
-                clip = VideoFileClip("temp_input_video")
-                frames = list(clip.iter_frames())
-                extracted_url = reveal_message_from_frames(frames)
-                import os
-                os.remove("temp_input_video")
-            else:
+            if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
                 raise HTTPException(status_code=400, detail="Formato de archivo no soportado.")
 
+            key = extracted_url = None
+            if self.cache and content_hash:
+                key = ResultCache.reveal_key(content_hash, os.path.splitext(filename)[1].lower())
+                extracted_url = await self._cache_lookup("reveal", self.cache.fetch_text, key)
+
+            if extracted_url is None:
+                await self.preflight(input_path, filename)
+                extracted_url, timer = await self._run(reveal_file, input_path, filename, progress_path)
+                record_media_job("reveal", timer, os.path.getsize(input_path))
+                if key:
+                    # También se guarda "" para responder rápido a portadores sin mensaje
+                    await self._cache_store(self.cache.store_text, key, extracted_url)
+
             if not extracted_url:
                 raise HTTPException(status_code=404, detail="No hay un video o link válido.")
 
@@ -96,7 +176,8 @@ class ImageSteganographyService:
 
             video_uuid_str = match.group(1)
 
-            video_data = await video_service.get_video_by_uuid(UUID(video_uuid_str))
+            with MEDIA_STAGE_LATENCY.labels("reveal", "db_lookup").time():
+                video_data = await video_service.get_video_by_uuid(UUID(video_uuid_str))
 
             if not video_data:
                 raise HTTPException(status_code=404, detail=f"Video con UUID '{video_uuid_str}' no encontrado.")
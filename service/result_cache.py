@@ -0,0 +1,142 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from util.media_io import remove_file
+
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "share_result_cache"))
+# Tamaño máximo del caché en disco; 0 lo desactiva
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Al superar el máximo se borran las entradas menos usadas hasta quedar en esta fracción
+RESULT_CACHE_LOW_WATERMARK = 0.9
+
+
+def _link_or_copy(source: str, destination: str):
+    # Un enlace duro no copia datos; entre sistemas de archivos distintos se copia
+    remove_file(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ResultCache:
+    """
+    Caché en disco de resultados de esteganografía, direccionado por el sha256 del archivo.
+    Guarda los archivos generados por share_video y las URLs extraídas por get_video.
+    Es LRU por fecha de modificación, que se actualiza en cada acierto, y varios workers
+    pueden compartir el directorio porque cada entrada se escribe con un os.replace atómico.
+    """
+
+    def __init__(self, directory: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Estimación local; otros workers también escriben, por eso se recalcula al desalojar
+        self.size: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def hide_key(content_hash: str, message: str, options: str) -> str:
+        return hashlib.sha256(f"hide\0{content_hash}\0{message}\0{options}".encode()).hexdigest()
+
+    @staticmethod
+    def reveal_key(content_hash: str, extension: str) -> str:
+        # La extensión decide cómo se decodifica el archivo, así que es parte de la clave
+        return hashlib.sha256(f"reveal\0{content_hash}\0{extension}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _hit(self, path: str):
+        os.utime(path)
+        self.hits += 1
+
+    def fetch_file(self, key: str, output_path: str) -> bool:
+        """Deja en output_path el archivo guardado con key. Devuelve False si no está."""
+        path = self._path(key)
+        try:
+            _link_or_copy(path, output_path)
+            self._hit(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        return True
+
+    def fetch_text(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            self._hit(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        return text
+
+    def _store(self, key: str, write):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        partial = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(partial)
+            os.replace(partial, path)
+        finally:
+            remove_file(partial)
+        self._added(os.path.getsize(path))
+
+    def store_file(self, key: str, source_path: str):
+        self._store(key, lambda partial: _link_or_copy(source_path, partial))
+
+    def store_text(self, key: str, text: str):
+        def write(partial: str):
+            with open(partial, "w", encoding="utf-8") as f:
+                f.write(text)
+
+        self._store(key, write)
+
+    def _added(self, size: int):
+        if self.size is None:
+            self.evict()
+            return
+        self.size += size
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Borra las entradas menos usadas hasta bajar de la marca inferior."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * RESULT_CACHE_LOW_WATERMARK
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                remove_file(path)
+                total -= size
+        self.size = total
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,97 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID
+
+from model.video_model import VideoInDB
+
+VIDEO_CACHE_TTL = float(os.environ.get("VIDEO_CACHE_TTL", 30))
+VIDEO_CACHE_SIZE = int(os.environ.get("VIDEO_CACHE_SIZE", 10000))
+
+
+class VideoCacheBackend(ABC):
+    """
+    Interfaz del backend compartido opcional (p. ej. Redis o memcached) para que varios workers
+    vean las mismas entradas. Guarda los videos como diccionarios serializables a JSON.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[dict]:
+        """El diccionario guardado en key, o None si no existe o ya venció."""
+
+    @abstractmethod
+    async def set(self, key: str, value: dict, ttl: float):
+        """Guarda value en key durante ttl segundos."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Elimina key si existe."""
+
+
+class VideoCache:
+    """Caché LRU con TTL de VideoInDB por video_uuid, con un backend compartido opcional detrás."""
+
+    def __init__(self, max_size: int = VIDEO_CACHE_SIZE, ttl: float = VIDEO_CACHE_TTL,
+                 backend: VideoCacheBackend = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, video_uuid: UUID) -> Optional[VideoInDB]:
+        key = str(video_uuid)
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            self.hits += 1
+            # Copia para que quien la reciba no modifique la entrada del caché
+            return entry[1].model_copy()
+        if entry:
+            del self.entries[key]
+
+        if self.backend:
+            data = await self.backend.get(key)
+            if data:
+                video = VideoInDB(**data)
+                self._store(key, video)
+                self.hits += 1
+                return video.model_copy()
+
+        self.misses += 1
+        return None
+
+    async def set(self, video: VideoInDB):
+        key = str(video.video_uuid)
+        self._store(key, video.model_copy())
+        if self.backend:
+            await self.backend.set(key, video.model_dump(mode="json", by_alias=True), self.ttl)
+
+    async def invalidate(self, video_uuid: UUID):
+        key = str(video_uuid)
+        self.entries.pop(key, None)
+        if self.backend:
+            await self.backend.delete(key)
+
+    def _store(self, key: str, video: VideoInDB):
+        self.entries[key] = (time.monotonic() + self.ttl, video)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+video_cache = VideoCache()
@@ -1,17 +1,80 @@
+import base64
+import json
 import uuid
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from uuid import UUID
 
+import orjson
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument, DESCENDING
+from pymongo.errors import BulkWriteError
 
+from config.database import list_read_preference
 from model.video_model import VideoCreate, VideoInDB, VideoUpdate
+from service.video_cache import VideoCache, video_cache
+from service.video_stats import VideoStats, video_stats, STATS_PROJECTION
+from service.view_counter import ViewCounter, view_counter
+
+
+# Campos que se pueden pedir en una proyección y su nombre en Mongo
+_FIELD_NAMES = {name: (field.alias or name) for name, field in VideoInDB.model_fields.items()}
+
+
+def _encode_cursor(upload_date: datetime, last_id: ObjectId) -> str:
+    data = json.dumps({'d': upload_date.isoformat(), 'i': str(last_id)})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def _projection(fields: Optional[List[str]], *required: str) -> Tuple[Optional[dict], List[str]]:
+    """
+    Proyección para fields más los campos required que se necesitan internamente. Devuelve también
+    los campos agregados que no se pidieron, para quitarlos de cada documento.
+    Lanza ValueError si algún campo no existe.
+    """
+    if not fields:
+        return None, []
+    unknown = [f for f in fields if f not in _FIELD_NAMES]
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+    projection = {_FIELD_NAMES[f]: 1 for f in fields}
+    if 'views' in fields:
+        # Las vistas pendientes del contador se buscan por video_uuid
+        required += ('video_uuid',)
+    hidden = [name for name in dict.fromkeys(required) if name not in projection]
+    projection.update(dict.fromkeys(hidden, 1))
+    return projection, hidden
+
+
+def _json_default(value):
+    # orjson ya serializa datetime y UUID; solo falta el ObjectId
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Lanza ValueError si el cursor no es válido."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data['d']), ObjectId(data['i'])
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
 
 
 class VideoService:
-    def __init__(self, collection: AsyncIOMotorCollection):
+    def __init__(self, collection: AsyncIOMotorCollection, cache: VideoCache = video_cache,
+                 counter: ViewCounter = view_counter, stats: VideoStats = video_stats):
         self.collection = collection
+        self.cache = cache
+        self.counter = counter
+        self.stats = stats
+        # Los listados toleran lecturas de secundarios según la configuración
+        self.list_collection = collection.with_options(read_preference=list_read_preference)
 
-    async def create_video(self, video_data: VideoCreate) -> VideoInDB:
+    @staticmethod
+    def _new_document(video_data: VideoCreate) -> dict:
         video_dict = video_data.model_dump(by_alias=True)
 
         if 'video_uuid' not in video_dict:
@@ -20,18 +83,160 @@ class VideoService:
         if 'views' not in video_dict:
             video_dict['views'] = 0
 
-        insert_result = await self.collection.insert_one(video_dict)
-        created_video = await self.collection.find_one({'_id': insert_result.inserted_id})
+        if 'upload_date' not in video_dict:
+            # Mongo guarda las fechas con precisión de milisegundos
+            now = datetime.utcnow()
+            video_dict['upload_date'] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+        return video_dict
+
+    async def create_video(self, video_data: VideoCreate) -> VideoInDB:
+        video_dict = self._new_document(video_data)
+        async with self.stats.recording([video_dict['uploader_username']]) as stats_delta:
+            insert_result = await self.collection.insert_one(video_dict)
+            stats_delta.add_videos([video_dict])
+        # El documento se arma localmente en vez de volver a leerlo de Mongo
+        video_dict['_id'] = insert_result.inserted_id
+        created_video = VideoInDB(**video_dict)
+
+        await self.cache.set(created_video)
+        return created_video
+
+    async def create_videos(self, videos: List[VideoCreate]) -> Tuple[List[VideoInDB], Dict[int, str]]:
+        """
+        Inserta todos los videos con un solo insert_many sin orden: un error en un elemento no detiene
+        al resto. Devuelve los creados y los errores por posición dentro de videos.
+        """
+        documents = [self._new_document(video) for video in videos]
+        if not documents:
+            return [], {}
+
+        errors = {}
+        async with self.stats.recording(document['uploader_username'] for document in documents) as stats_delta:
+            try:
+                await self.collection.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                errors = {error['index']: error.get('errmsg', 'Error al insertar')
+                          for error in e.details.get('writeErrors', [])}
+
+            # insert_many asigna el _id en cada documento; los lotes no se cargan en el caché para no desplazar a los más vistos
+            inserted = [document for index, document in enumerate(documents) if index not in errors]
+            stats_delta.add_videos(inserted)
+        return [VideoInDB(**document) for document in inserted], errors
 
-        return VideoInDB(**created_video)
+    async def get_videos_by_uuids(self, video_uuids: List[UUID]) -> List[VideoInDB]:
+        """Resuelve los que están en caché y el resto con una sola consulta $in."""
+        videos = []
+        missing = []
+        for video_uuid in dict.fromkeys(video_uuids):
+            cached = await self.cache.get(video_uuid)
+            if cached:
+                videos.append(cached)
+            else:
+                missing.append(str(video_uuid))
+
+        if missing:
+            videos_cursor = self.collection.find({'video_uuid': {'$in': missing}})
+            videos.extend([VideoInDB.model_validate(vid) async for vid in videos_cursor])
+        return [self._with_pending_views(video) for video in videos]
+
+    async def delete_videos(self, video_uuids: List[UUID]) -> int:
+        # Se leen antes los campos del resumen y se borra por _id exactamente lo que se leyó
+        documents = await self.collection.find({'video_uuid': {'$in': [str(u) for u in video_uuids]}},
+                                               STATS_PROJECTION).to_list(length=None)
+        async with self.stats.recording(document['uploader_username'] for document in documents) as stats_delta:
+            delete_result = await self.collection.delete_many({'_id': {'$in': [d['_id'] for d in documents]}})
+            stats_delta.add_videos(documents, sign=-1)
+        for video_uuid in video_uuids:
+            await self.cache.invalidate(video_uuid)
+            self.counter.discard(video_uuid)
+        return delete_result.deleted_count
 
     async def get_all_videos(self, skip: int = 0, limit: int = 100) -> List[VideoInDB]:
-        videos_cursor = self.collection.find().skip(skip).limit(limit)
-        return [VideoInDB.model_validate(vid) async for vid in videos_cursor]
+        videos_cursor = self.list_collection.find().skip(skip).limit(limit)
+        return [self._with_pending_views(VideoInDB.model_validate(vid)) async for vid in videos_cursor]
+
+    async def get_videos_page(self, cursor: Optional[str] = None, limit: int = 100,
+                              fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Paginación por llave (upload_date, _id) descendente: cada página cuesta lo mismo sin importar
+        cuán profundo se pagine. fields limita los campos devueltos de cada documento.
+        Lanza ValueError si el cursor o algún campo no son válidos.
+        """
+        query = {}
+        if cursor:
+            upload_date, last_id = _decode_cursor(cursor)
+            query = {'$or': [
+                {'upload_date': {'$lt': upload_date}},
+                {'upload_date': upload_date, '_id': {'$lt': last_id}},
+            ]}
+
+        # El cursor siempre necesita la llave de orden
+        projection, hidden = _projection(fields, 'upload_date')
+        videos_cursor = self.list_collection.find(query, projection) \
+            .sort([('upload_date', DESCENDING), ('_id', DESCENDING)]).limit(limit + 1)
+        documents = await videos_cursor.to_list(length=limit + 1)
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = _encode_cursor(documents[-1]['upload_date'], documents[-1]['_id'])
+
+        items = []
+        for document in documents:
+            if 'views' in document and 'video_uuid' in document:
+                document['views'] += self.counter.pending_for(document['video_uuid'])
+            document['_id'] = str(document['_id'])
+            for name in hidden:
+                del document[name]
+            items.append(document)
+        return items, next_cursor
+
+    def export_videos(self, fields: Optional[List[str]] = None, batch_size: int = 1000) -> AsyncIterator[bytes]:
+        """
+        Exporta el catálogo completo como NDJSON, en orden de _id, directo desde el cursor: los
+        documentos de Mongo se serializan con orjson sin pasar por VideoInDB. Devuelve un bloque
+        de bytes por cada batch_size documentos. Lanza ValueError si algún campo no es válido.
+        """
+        projection, hidden = _projection(fields)
+        return self._export_lines(projection, hidden, batch_size)
+
+    async def _export_lines(self, projection: Optional[dict], hidden: List[str],
+                            batch_size: int) -> AsyncIterator[bytes]:
+        videos_cursor = self.list_collection.find({}, projection, batch_size=batch_size).sort('_id', 1)
+        lines = []
+        async for document in videos_cursor:
+            if 'views' in document and 'video_uuid' in document:
+                document['views'] += self.counter.pending_for(document['video_uuid'])
+            for name in hidden:
+                del document[name]
+            lines.append(orjson.dumps(document, default=_json_default, option=orjson.OPT_APPEND_NEWLINE))
+            if len(lines) >= batch_size:
+                yield b''.join(lines)
+                lines = []
+        if lines:
+            yield b''.join(lines)
+
+    async def get_top_videos(self, limit: int = 10) -> List[VideoInDB]:
+        """Los más vistos según las vistas ya guardadas; lee solo limit entradas del índice de views."""
+        videos_cursor = self.list_collection.find().sort([('views', DESCENDING), ('_id', DESCENDING)]).limit(limit)
+        return [self._with_pending_views(VideoInDB.model_validate(vid)) async for vid in videos_cursor]
+
+    async def get_recent_videos(self, limit: int = 10) -> List[VideoInDB]:
+        videos_cursor = self.list_collection.find() \
+            .sort([('upload_date', DESCENDING), ('_id', DESCENDING)]).limit(limit)
+        return [self._with_pending_views(VideoInDB.model_validate(vid)) async for vid in videos_cursor]
 
     async def get_video_by_uuid(self, video_uuid: UUID) -> Optional[VideoInDB]:
+        cached = await self.cache.get(video_uuid)
+        if cached:
+            return self._with_pending_views(cached)
+        return self._with_pending_views(await self._fetch_video(video_uuid))
+
+    async def _fetch_video(self, video_uuid: UUID) -> Optional[VideoInDB]:
+        """Lee el video directamente de Mongo y refresca el caché."""
         video = await self.collection.find_one({'video_uuid': str(video_uuid)})
-        return VideoInDB(**video) if video else None
+        return await self._cache_result(video)
 
     async def update_video(self, video_uuid: UUID, video_data: VideoUpdate) -> Optional[VideoInDB]:
         update_data = {k: v for k, v in video_data.model_dump(exclude_unset=True).items()}
@@ -39,25 +244,65 @@ class VideoService:
         if not update_data:
             return None
 
-        update_result = await self.collection.update_one(
+        if 'views' in update_data:
+            # Un valor explícito de vistas reemplaza a los incrementos aún no guardados
+            self.counter.discard(video_uuid)
+        if 'uploader_username' in update_data:
+            self.counter.set_uploader(video_uuid, update_data['uploader_username'])
+
+        # Con el documento anterior se calcula el cambio en el resumen; el nuevo es el anterior más el $set
+        previous = await self.collection.find_one_and_update(
             {'video_uuid': str(video_uuid)},
-            {'$set': update_data}
+            {'$set': update_data},
+            return_document=ReturnDocument.BEFORE
         )
-        if update_result.modified_count > 0:
-            return await self.get_video_by_uuid(video_uuid)
-        return None
+        if not previous:
+            return None
+        updated_video = {**previous, **update_data}
+        await self.stats.record_update(previous, updated_video)
+        return self._with_pending_views(await self._cache_result(updated_video))
 
 
     async def delete_video(self, video_uuid: UUID) -> bool:
-        delete_result = await self.collection.delete_one({"video_uuid": str(video_uuid)})
-        return delete_result.deleted_count == 1
+        deleted = await self.collection.find_one_and_delete({"video_uuid": str(video_uuid)},
+                                                            projection=STATS_PROJECTION)
+        await self.cache.invalidate(video_uuid)
+        self.counter.discard(video_uuid)
+        if not deleted:
+            return False
+        await self.stats.record_videos([deleted], sign=-1)
+        return True
 
 
     async def increment_views(self, video_uuid: UUID) -> Optional[VideoInDB]:
-        update_result = await self.collection.update_one(
+        if self.counter.running:
+            # El incremento queda en memoria y se guarda en el próximo bulk_write del contador
+            video = await self.get_video_by_uuid(video_uuid)
+            if not video:
+                return None
+            self.counter.add(video_uuid, video.uploader_username)
+            video.views += 1
+            return video
+
+        # Una sola operación atómica: comprueba que exista, incrementa y devuelve el documento
+        updated_video = await self.collection.find_one_and_update(
             {"video_uuid": str(video_uuid)},
-            {"$inc": {"views": 1}}
+            {"$inc": {"views": 1}},
+            return_document=ReturnDocument.AFTER
         )
-        if update_result.modified_count == 1:
-            return await self.get_video_by_uuid(video_uuid)
-        return None
\ No newline at end of file
+        if updated_video:
+            await self.stats.record_views({updated_video['uploader_username']: 1})
+        return await self._cache_result(updated_video)
+
+    async def _cache_result(self, document: Optional[dict]) -> Optional[VideoInDB]:
+        if not document:
+            return None
+        video = VideoInDB(**document)
+        await self.cache.set(video)
+        return video
+
+    def _with_pending_views(self, video: Optional[VideoInDB]) -> Optional[VideoInDB]:
+        """Suma a las vistas guardadas los incrementos que aún están en el contador."""
+        if video:
+            video.views += self.counter.pending_for(video.video_uuid)
+        return video
\ No newline at end of file
@@ -0,0 +1,290 @@
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from model.video_model import UploaderSort, UploaderStats
+
+# Cada cuántos segundos se recalcula el resumen completo; 0 deja solo las actualizaciones
+# incrementales. Entre todos los workers se hace un solo recálculo por intervalo.
+STATS_REFRESH_INTERVAL = float(os.environ.get("STATS_REFRESH_INTERVAL", 3600))
+# Duración máxima del candado de un recálculo; si el worker muere el candado vence solo
+STATS_REFRESH_LOCK_SECONDS = float(os.environ.get("STATS_REFRESH_LOCK_SECONDS", 300))
+STATS_REFRESH_LOCK_ID = "uploader_stats_refresh"
+# Documento con la fecha del próximo recálculo periódico, compartido por todos los workers
+STATS_REFRESH_SCHEDULE_ID = "uploader_stats_schedule"
+
+# Una marca de escritura en curso más vieja que esto se considera abandonada (el worker murió
+# entre la escritura del video y la del resumen) y el recálculo vuelve a corregir al uploader
+STATS_PENDING_TIMEOUT = float(os.environ.get("STATS_PENDING_TIMEOUT", 300))
+
+_SUMMARY_FIELDS = ('video_count', 'total_views', 'rating_sum')
+
+# Campos de un video que afectan al resumen de su uploader
+STATS_PROJECTION = {'uploader_username': 1, 'views': 1, 'rating_stars': 1}
+
+
+class StatsDelta:
+    """Cambios al resumen por uploader: [videos, vistas, suma de calificaciones]."""
+
+    def __init__(self):
+        self.deltas: Dict[str, list] = {}
+
+    def _add(self, uploader: str, videos: int, views: int, rating: int):
+        delta = self.deltas.setdefault(uploader, [0, 0, 0])
+        delta[0] += videos
+        delta[1] += views
+        delta[2] += rating
+
+    def add_videos(self, documents: Iterable[dict], sign: int = 1):
+        """Suma (sign=1, videos creados) o resta (sign=-1, videos eliminados) los documentos."""
+        for document in documents:
+            self._add(document['uploader_username'], sign, sign * document.get('views', 0),
+                      sign * document['rating_stars'])
+
+    def add_update(self, before: dict, after: dict):
+        self.add_videos([before], -1)
+        self.add_videos([after])
+
+    def add_views(self, views_by_uploader: Dict[str, int]):
+        for uploader, views in views_by_uploader.items():
+            self._add(uploader, 0, views, 0)
+
+
+class VideoStats:
+    """
+    Resumen materializado por uploader_username en su propia colección: cantidad de videos,
+    vistas totales y suma de calificaciones (el promedio se calcula al leer). VideoService y el
+    contador de vistas lo mantienen con $inc en cada escritura, así los tableros leen unos pocos
+    documentos en vez de recorrer videos. El recálculo periódico agrupa videos y corrige con $inc
+    cualquier desvío (p. ej. escrituras del resumen que fallaron).
+
+    Cada documento lleva seq, que aumenta con cada escritura, y pending, la cantidad de escrituras
+    marcadas con recording cuyo video ya se pudo haber guardado pero el resumen todavía no. El
+    recálculo solo corrige a un uploader si no tiene escrituras en curso y su seq no cambió desde
+    antes de la agregación, así nunca descuenta ni cuenta dos veces una escritura marcada.
+    """
+
+    def __init__(self, interval: float = STATS_REFRESH_INTERVAL):
+        self.interval = interval
+        self.videos: AsyncIOMotorCollection = None
+        self.collection: AsyncIOMotorCollection = None
+        self.last_refresh: Optional[datetime] = None
+        self._task: asyncio.Task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.collection is not None
+
+    async def _write(self, delta: StatsDelta, marked: Iterable[str] = ()):
+        """Aplica delta y descuenta las marcas de escritura en curso de los uploaders marked."""
+        if not self.enabled:
+            return
+        marked = set(marked)
+        operations = []
+        for uploader in set(delta.deltas) | marked:
+            values = delta.deltas.get(uploader, [0, 0, 0])
+            inc = dict(zip(_SUMMARY_FIELDS, values)) if any(values) else {}
+            if uploader in marked:
+                inc['pending'] = -1
+            if inc:
+                inc['seq'] = 1
+                operations.append(UpdateOne({'_id': uploader}, {'$inc': inc}, upsert=True))
+        if not operations:
+            return
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # El video ya se guardó; el resumen (y las marcas, al vencer) se corrigen en el próximo recálculo
+            print(f"No se pudo actualizar el resumen de uploaders: {e}")
+
+    async def _mark(self, uploaders: Iterable[str]) -> set:
+        """Marca una escritura en curso por uploader. Devuelve los que quedaron marcados."""
+        uploaders = set(uploaders)
+        if not self.enabled or not uploaders:
+            return set()
+        now = datetime.utcnow()
+        operations = [UpdateOne({'_id': uploader}, {'$inc': {'pending': 1, 'seq': 1}, '$max': {'marked_at': now}},
+                                upsert=True) for uploader in uploaders]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Sin marca la escritura sigue, con la misma ventana que una escritura sin recording
+            print(f"No se pudo marcar la escritura en el resumen de uploaders: {e}")
+            return set()
+        return uploaders
+
+    @asynccontextmanager
+    async def recording(self, uploaders: Iterable[str]) -> AsyncIterator[StatsDelta]:
+        """
+        Para escrituras de videos cuyos uploaders se conocen de antemano: las marca como en curso,
+        el bloque guarda los videos y agrega los cambios al StatsDelta, y al salir se aplican los
+        cambios y se quitan las marcas en una sola escritura (también si el bloque falla).
+        """
+        marked = await self._mark(uploaders)
+        delta = StatsDelta()
+        try:
+            yield delta
+        finally:
+            await self._write(delta, marked)
+
+    async def record_videos(self, documents: Iterable[dict], sign: int = 1):
+        """Suma (sign=1, videos creados) o resta (sign=-1, videos eliminados) los documentos."""
+        delta = StatsDelta()
+        delta.add_videos(documents, sign)
+        await self._write(delta)
+
+    async def record_update(self, before: dict, after: dict):
+        delta = StatsDelta()
+        delta.add_update(before, after)
+        await self._write(delta)
+
+    async def record_views(self, views_by_uploader: Dict[str, int]):
+        delta = StatsDelta()
+        delta.add_views(views_by_uploader)
+        await self._write(delta)
+
+    async def _acquire(self, owner: str, lease: float) -> bool:
+        """Candado en la colección locks, compartido por todos los workers."""
+        now = datetime.utcnow()
+        locks = self.collection.database["locks"]
+        try:
+            # Si el candado existe y no venció el filtro no coincide y el upsert choca con el _id
+            await locks.update_one({'_id': STATS_REFRESH_LOCK_ID, 'expires_at': {'$lt': now}},
+                                   {'$set': {'owner': owner, 'expires_at': now + timedelta(seconds=lease)}},
+                                   upsert=True)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def _release(self, owner: str):
+        await self.collection.database["locks"].delete_one({'_id': STATS_REFRESH_LOCK_ID, 'owner': owner})
+
+    async def _claim_periodic_run(self) -> bool:
+        """True si a este worker le toca el recálculo periódico; lo reserva hasta dentro de interval segundos."""
+        now = datetime.utcnow()
+        try:
+            # Como en _acquire: si el próximo recálculo aún no toca el upsert choca con el _id
+            await self.collection.database["locks"].update_one(
+                {'_id': STATS_REFRESH_SCHEDULE_ID, 'next_run_at': {'$lte': now}},
+                {'$set': {'next_run_at': now + timedelta(seconds=self.interval)}},
+                upsert=True)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @staticmethod
+    def _correction(stored: dict, values: list, abandoned_before: datetime) -> Optional[UpdateOne]:
+        """$inc que lleva stored a values, condicionado a que el documento no haya cambiado desde que se leyó."""
+        update = {}
+        if stored.get('pending', 0) > 0:
+            if stored.get('marked_at', abandoned_before) >= abandoned_before:
+                # Hay una escritura en curso: su video puede o no estar en la agregación
+                return None
+            update['$set'] = {'pending': 0}
+        # Siempre los tres campos, para que existan aunque el documento lo haya creado una marca
+        inc = {field: value - stored.get(field, 0) for field, value in zip(_SUMMARY_FIELDS, values)}
+        if any(inc.values()):
+            update['$inc'] = {**inc, 'seq': 1}
+        if not update:
+            return None
+        # Si seq cambió, una escritura llegó después de la lectura y la diferencia ya no es válida
+        return UpdateOne({'_id': stored['_id'], 'seq': stored.get('seq')}, update)
+
+    async def refresh(self) -> Optional[int]:
+        """
+        Recalcula el resumen desde videos. Devuelve la cantidad de uploaders, o None si otro worker
+        está recalculando. El candado solo se mantiene mientras dura el recálculo.
+
+        Los uploaders con escrituras durante el recálculo no se corrigen en esta pasada. Las
+        escrituras sin marca (actualizaciones y eliminaciones de un solo video, vistas sin el
+        contador) dejan una ventana de una operación entre el video y el resumen: si el recálculo
+        cae justo ahí el uploader queda desviado en esa operación hasta el siguiente recálculo.
+        """
+        owner = str(uuid.uuid4())
+        if not await self._acquire(owner, STATS_REFRESH_LOCK_SECONDS):
+            return None
+        try:
+            abandoned_before = datetime.utcnow() - timedelta(seconds=STATS_PENDING_TIMEOUT)
+            # El resumen se lee antes de agregar: cualquier escritura posterior a esta lectura cambia
+            # seq y anula la corrección de su uploader
+            stored = {document['_id']: document async for document in self.collection.find()}
+            pipeline = [{'$group': {'_id': '$uploader_username', 'video_count': {'$sum': 1},
+                                    'total_views': {'$sum': '$views'}, 'rating_sum': {'$sum': '$rating_stars'}}}]
+            groups = await self.videos.aggregate(pipeline).to_list(length=None)
+
+            operations = []
+            for group in groups:
+                values = [group[field] for field in _SUMMARY_FIELDS]
+                document = stored.pop(group['_id'], None)
+                if document is None:
+                    # Uploader nuevo: si alguien creó su documento mientras tanto, no se toca
+                    operations.append(UpdateOne({'_id': group['_id']},
+                                                {'$setOnInsert': dict(zip(_SUMMARY_FIELDS, values))}, upsert=True))
+                    continue
+                operation = self._correction(document, values, abandoned_before)
+                if operation:
+                    operations.append(operation)
+            # Lo que queda en stored no salió en la agregación: uploaders que ya no tienen videos
+            for document in stored.values():
+                operation = self._correction(document, [0, 0, 0], abandoned_before)
+                if operation:
+                    operations.append(operation)
+            if operations:
+                await self.collection.bulk_write(operations, ordered=False)
+            # Los que quedaron en cero y sin escrituras en curso ya no hacen falta
+            await self.collection.delete_many({field: {'$not': {'$gt': 0}} for field in _SUMMARY_FIELDS + ('pending',)})
+            self.last_refresh = datetime.utcnow()
+            return len(groups)
+        finally:
+            await self._release(owner)
+
+    @staticmethod
+    def _summary(document: dict) -> UploaderStats:
+        count = document['video_count']
+        return UploaderStats(
+            uploader_username=document['_id'],
+            video_count=count,
+            total_views=document['total_views'],
+            average_rating=document['rating_sum'] / count,
+        )
+
+    async def top_uploaders(self, sort: UploaderSort = UploaderSort.total_views, limit: int = 10) -> List[UploaderStats]:
+        stats_cursor = self.collection.find({'video_count': {'$gt': 0}}) \
+            .sort([(sort.value, DESCENDING), ('_id', ASCENDING)]).limit(limit)
+        return [self._summary(document) async for document in stats_cursor]
+
+    async def get_uploader(self, uploader_username: str) -> Optional[UploaderStats]:
+        document = await self.collection.find_one({'_id': uploader_username, 'video_count': {'$gt': 0}})
+        return self._summary(document) if document else None
+
+    async def _refresh_periodically(self):
+        while True:
+            try:
+                uploaders = await self.refresh() if await self._claim_periodic_run() else None
+                if uploaders is not None:
+                    print(f"Resumen de uploaders recalculado ({uploaders} uploaders)")
+            except Exception as e:
+                print(f"No se pudo recalcular el resumen de uploaders: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self, videos: AsyncIOMotorCollection, collection: AsyncIOMotorCollection):
+        self.videos = videos
+        self.collection = collection
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+video_stats = VideoStats()
@@ -0,0 +1,136 @@
+import asyncio
+import os
+from typing import Dict
+from uuid import UUID
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from service.video_cache import VideoCache, video_cache
+from service.video_stats import VideoStats, video_stats
+
+VIEW_FLUSH_INTERVAL = float(os.environ.get("VIEW_FLUSH_INTERVAL", 5))
+VIEW_FLUSH_THRESHOLD = int(os.environ.get("VIEW_FLUSH_THRESHOLD", 1000))
+
+
+class ViewCounter:
+    """
+    Acumula en memoria los incrementos de vistas por video_uuid y los escribe en Mongo
+    como un solo bulk_write de $inc, cada VIEW_FLUSH_INTERVAL segundos o al llegar a
+    VIEW_FLUSH_THRESHOLD incrementos pendientes. Las vistas guardadas se suman también al
+    resumen de cada uploader.
+    """
+
+    def __init__(self, interval: float = VIEW_FLUSH_INTERVAL, threshold: int = VIEW_FLUSH_THRESHOLD,
+                 cache: VideoCache = video_cache, stats: VideoStats = video_stats):
+        self.interval = interval
+        self.threshold = threshold
+        self.cache = cache
+        self.stats = stats
+        self.collection: AsyncIOMotorCollection = None
+        self.pending: Dict[str, int] = {}
+        # Uploader de cada video con vistas pendientes, para el resumen por uploader
+        self.uploaders: Dict[str, str] = {}
+        # Incrementos que se están escribiendo; siguen contando en las lecturas hasta confirmarse
+        self.flushing: Dict[str, int] = {}
+        self.total_pending = 0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task = None
+        # Flush lanzado al llegar al umbral; se guarda la referencia para que no lo recolecte el GC
+        self._flush_task: asyncio.Task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def add(self, video_uuid: UUID, uploader_username: str = None):
+        key = str(video_uuid)
+        self.pending[key] = self.pending.get(key, 0) + 1
+        if uploader_username:
+            self.uploaders[key] = uploader_username
+        self.total_pending += 1
+        if self.total_pending >= self.threshold and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_logged())
+
+    def pending_for(self, video_uuid: UUID) -> int:
+        key = str(video_uuid)
+        return self.pending.get(key, 0) + self.flushing.get(key, 0)
+
+    def set_uploader(self, video_uuid: UUID, uploader_username: str):
+        """Las vistas aún no guardadas de un video que cambia de uploader se suman al nuevo."""
+        key = str(video_uuid)
+        if key in self.uploaders:
+            self.uploaders[key] = uploader_username
+
+    def discard(self, video_uuid: UUID):
+        count = self.pending.pop(str(video_uuid), 0)
+        self.total_pending -= count
+        if str(video_uuid) not in self.flushing:
+            self.uploaders.pop(str(video_uuid), None)
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            self.flushing, self.pending = self.pending, {}
+            self.total_pending = 0
+
+            keys = list(self.flushing)
+            # El resumen marca a los uploaders antes de escribir las vistas, así un recálculo
+            # simultáneo no las cuenta dos veces
+            uploaders = {self.uploaders[key] for key in keys if key in self.uploaders}
+            async with self.stats.recording(uploaders) as stats_delta:
+                operations = [UpdateOne({'video_uuid': key}, {'$inc': {'views': self.flushing[key]}}) for key in keys]
+                failed = []
+                try:
+                    await self.collection.bulk_write(operations, ordered=False)
+                except BulkWriteError as e:
+                    failed = [keys[error['index']] for error in e.details.get('writeErrors', [])]
+                except Exception as e:
+                    print(f"No se pudieron guardar las vistas pendientes: {e}")
+                    failed = keys
+
+                # Lo que no se pudo escribir vuelve a quedar pendiente para el siguiente intento
+                for key in failed:
+                    count = self.flushing.pop(key)
+                    self.pending[key] = self.pending.get(key, 0) + count
+                    self.total_pending += count
+
+                # Las entradas del caché tienen el valor anterior al $inc
+                flushed, self.flushing = self.flushing, {}
+                views_by_uploader = {}
+                for key, count in flushed.items():
+                    await self.cache.invalidate(key)
+                    uploader = self.uploaders.get(key) if key in self.pending else self.uploaders.pop(key, None)
+                    if uploader:
+                        views_by_uploader[uploader] = views_by_uploader.get(uploader, 0) + count
+                stats_delta.add_views(views_by_uploader)
+
+    async def _flush_logged(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"No se pudieron guardar las vistas pendientes: {e}")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flush_task:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,269 @@
+import io
+import shutil
+
+import numpy as np
+from PIL import Image
+
+from util.probe import EXTENSION_INTRODUCER, IMAGE_SEPARATOR, DESCRIPTOR_STRUCT, SCREEN_STRUCT, color_table_size
+from util.steganography import message_to_bits, PayloadExtractor
+from util.timing import StageTimer
+
+# Modo paleta para GIFs: el mensaje va en el LSB de los índices de paleta del primer frame.
+# La paleta de ese frame se reordena para que los índices 2k y 2k+1 tengan el mismo color
+# (si usa 128 colores o menos) o el color más parecido disponible (si usa más), así cambiar el
+# LSB no altera o apenas altera la imagen. Ese frame se guarda con paleta local y el resto
+# del archivo se copia byte a byte, sin decodificar ni recodificar los demás frames.
+
+GRAPHIC_CONTROL_LABEL = 0xF9
+
+# Con hasta este número de colores cada color ocupa un par completo de índices
+PAIRED_PALETTE_COLORS = 128
+
+
+class GifFrame:
+    """Primer frame de un GIF tal como está en el archivo, con sus datos LZW sin decodificar."""
+
+    def __init__(self, left: int, top: int, width: int, height: int, flags: int, color_table: bytes,
+                 lzw_data: bytes):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.flags = flags
+        self.color_table = color_table
+        self.lzw_data = lzw_data
+
+
+class GifHead:
+    """
+    Todo lo que hay antes del primer frame (bloques sin modificar) y el primer frame.
+    El archivo queda posicionado justo después de ese frame.
+    """
+
+    def __init__(self, header: bytes, global_table: bytes, blocks: list, control_index: int, frame: GifFrame):
+        self.header = header
+        self.global_table = global_table
+        self.blocks = blocks
+        self.control_index = control_index
+        self.frame = frame
+
+    @property
+    def control(self) -> bytes:
+        return self.blocks[self.control_index] if self.control_index is not None else None
+
+    @property
+    def transparent_index(self):
+        control = self.control
+        if control is None or not control[3] & 1:
+            return None
+        return control[6]
+
+
+def _read(file, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("El GIF está incompleto.")
+    return data
+
+
+def _read_sub_blocks(file) -> bytes:
+    parts = []
+    while True:
+        size = _read(file, 1)
+        parts.append(size)
+        if size == b'\x00':
+            return b''.join(parts)
+        parts.append(_read(file, size[0]))
+
+
+def _size_bits(table: bytes) -> int:
+    # Inverso de color_table_size: una tabla de 2^(n+1) colores se declara con n
+    return len(table).bit_length() - 3
+
+
+def read_gif_head(file) -> GifHead:
+    """Lanza ValueError si el archivo no es un GIF o no tiene frames."""
+    header = file.read(6)
+    if header not in (b'GIF87a', b'GIF89a'):
+        raise ValueError("No es un GIF válido.")
+    screen = _read(file, SCREEN_STRUCT.size)
+    flags = screen[4]
+    global_table = _read(file, color_table_size(flags)) if flags & 0x80 else None
+    header += screen
+
+    blocks = []
+    control_index = None
+    while True:
+        introducer = _read(file, 1)[0]
+        if introducer == EXTENSION_INTRODUCER:
+            label = _read(file, 1)
+            blocks.append(bytes((introducer,)) + label + _read_sub_blocks(file))
+            if label[0] == GRAPHIC_CONTROL_LABEL:
+                control_index = len(blocks) - 1
+        elif introducer == IMAGE_SEPARATOR:
+            _, left, top, width, height, flags = DESCRIPTOR_STRUCT.unpack(
+                bytes((introducer,)) + _read(file, DESCRIPTOR_STRUCT.size - 1))
+            color_table = _read(file, color_table_size(flags)) if flags & 0x80 else None
+            lzw_data = _read(file, 1) + _read_sub_blocks(file)
+            frame = GifFrame(left, top, width, height, flags, color_table, lzw_data)
+            return GifHead(header, global_table, blocks, control_index, frame)
+        else:
+            raise ValueError("El GIF no tiene frames.")
+
+
+def _palette(head: GifHead) -> np.ndarray:
+    table = head.frame.color_table or head.global_table
+    if table is None:
+        raise ValueError("El primer frame del GIF no tiene paleta.")
+    return np.frombuffer(table, dtype=np.uint8).reshape(-1, 3)
+
+
+def _single_frame_gif(width: int, height: int, interlaced: bool, table: bytes, lzw_data: bytes) -> bytes:
+    descriptor = DESCRIPTOR_STRUCT.pack(IMAGE_SEPARATOR, 0, 0, width, height,
+                                        0x80 | (0x40 if interlaced else 0) | _size_bits(table))
+    return b'GIF89a' + SCREEN_STRUCT.pack(width, height, 0, 0, 0) + descriptor + table + lzw_data + b';'
+
+
+def decode_indices(head: GifHead) -> np.ndarray:
+    """Índices de paleta del primer frame, de tamaño (alto, ancho)."""
+    frame = head.frame
+    table = _palette(head).tobytes()
+    data = _single_frame_gif(frame.width, frame.height, bool(frame.flags & 0x40), table, frame.lzw_data)
+    with Image.open(io.BytesIO(data)) as img:
+        # Pillow entrega "L" en vez de "P" si la paleta es una escala de grises; los valores son los mismos
+        return np.array(img, dtype=np.uint8)
+
+
+def encode_indices(indices: np.ndarray, table: bytes) -> bytes:
+    """Datos LZW (tamaño mínimo de código y subbloques) de los índices, sin entrelazar."""
+    img = Image.frombytes('P', (indices.shape[1], indices.shape[0]), indices.tobytes())
+    img.putpalette(table)
+    buffer = io.BytesIO()
+    img.save(buffer, format='GIF', interlace=False, optimize=False)
+    buffer.seek(0)
+    return read_gif_head(buffer).frame.lzw_data
+
+
+def _embeddable(indices: np.ndarray, transparent_index) -> np.ndarray:
+    """Posiciones que llevan bits: todas menos las del par de índices del color transparente."""
+    if transparent_index is None:
+        return np.arange(indices.size)
+    return np.flatnonzero((indices >> 1) != (transparent_index >> 1))
+
+
+def _nearest_pairs(colors: np.ndarray) -> np.ndarray:
+    """Orden de los colores en que cada posición par queda junto al color libre más cercano."""
+    rgb = colors.astype(np.int64)
+    distances = ((rgb[:, None, :] - rgb[None, :, :]) ** 2).sum(axis=-1).astype(np.float64)
+    np.fill_diagonal(distances, np.inf)
+    paired = np.zeros(len(colors), dtype=bool)
+    order = []
+    for i in np.argsort(rgb @ np.array([299, 587, 114]), kind='stable'):
+        if paired[i]:
+            continue
+        paired[i] = True
+        order.append(i)
+        candidates = np.where(paired, np.inf, distances[i])
+        j = int(np.argmin(candidates))
+        if np.isfinite(candidates[j]):
+            paired[j] = True
+            order.append(j)
+    return np.array(order)
+
+
+def _paired_palette(palette: np.ndarray, indices: np.ndarray, transparent_index):
+    """Paleta nueva y tabla de índice anterior -> índice nuevo (siempre par o primero del par)."""
+    used = np.unique(indices)
+    if transparent_index is not None:
+        used = np.union1d(used, [transparent_index])
+    mapping = np.zeros(256, dtype=np.uint8)
+
+    if len(used) <= PAIRED_PALETTE_COLORS:
+        mapping[used] = np.arange(len(used)) * 2
+        colors = np.repeat(palette[used], 2, axis=0)
+    else:
+        order = used[_nearest_pairs(palette[used])]
+        mapping[order] = np.arange(len(order))
+        colors = palette[order]
+        if len(colors) % 2:
+            colors = np.vstack((colors, colors[-1:]))
+
+    table_entries = max(2, 1 << (len(colors) - 1).bit_length())
+    table = np.zeros((table_entries, 3), dtype=np.uint8)
+    table[:len(colors)] = colors
+    return table.tobytes(), mapping
+
+
+def hide_message_in_gif(input_path: str, output_path: str, message: str, timer: StageTimer = None) -> bool:
+    """
+    Oculta el mensaje en los índices de paleta del primer frame. Devuelve False, sin escribir
+    output_path, si el primer frame no tiene capacidad suficiente o usa índices fuera de su paleta.
+    """
+    timer = timer or StageTimer()
+    bits = message_to_bits(message)
+
+    with open(input_path, 'rb') as src:
+        with timer.stage("decode"):
+            head = read_gif_head(src)
+            palette = _palette(head)
+            indices = decode_indices(head)
+        if int(indices.max(initial=0)) >= len(palette):
+            return False
+
+        with timer.stage("embed"):
+            transparent_index = head.transparent_index
+            table, mapping = _paired_palette(palette, indices, transparent_index)
+            new_indices = mapping[indices]
+            new_transparent = None if transparent_index is None else int(mapping[transparent_index])
+
+            flat = new_indices.reshape(-1)
+            positions = _embeddable(flat, new_transparent)[:len(bits)]
+            if len(positions) < len(bits):
+                return False
+            flat[positions] = (flat[positions] & 0xFE) | bits
+
+        with timer.stage("encode"):
+            frame = head.frame
+            blocks = list(head.blocks)
+            if new_transparent is not None:
+                control = bytearray(head.control)
+                control[6] = new_transparent
+                blocks[head.control_index] = bytes(control)
+
+            descriptor = DESCRIPTOR_STRUCT.pack(IMAGE_SEPARATOR, frame.left, frame.top, frame.width,
+                                                frame.height, 0x80 | _size_bits(table))
+            with open(output_path, 'wb') as dst:
+                dst.write(head.header)
+                if head.global_table:
+                    dst.write(head.global_table)
+                dst.writelines(blocks)
+                dst.write(descriptor + table + encode_indices(new_indices, table))
+                # Los demás frames, sus duraciones y métodos de disposición se copian tal cual
+                shutil.copyfileobj(src, dst)
+
+    timer.frames += 1
+    return True
+
+
+def reveal_message_from_gif(input_path: str, timer: StageTimer = None) -> str:
+    """Mensaje oculto en modo paleta, o "" si el primer frame no tiene uno."""
+    timer = timer or StageTimer()
+    with open(input_path, 'rb') as src:
+        with timer.stage("decode"):
+            try:
+                head = read_gif_head(src)
+                indices = decode_indices(head)
+            except (ValueError, OSError):
+                return ""
+
+    with timer.stage("extract"):
+        flat = indices.reshape(-1)
+        transparent_index = head.transparent_index
+        if transparent_index is not None:
+            flat = flat[_embeddable(flat, transparent_index)]
+        # Solo el formato con encabezado: el formato antiguo nunca se escribió en modo paleta
+        extractor = PayloadExtractor(legacy_fallback=False)
+        extractor.feed(flat)
+
+    timer.frames += 1
+    return extractor.message
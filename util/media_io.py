@@ -0,0 +1,171 @@
+import asyncio
+import os
+import re
+import tempfile
+import time
+import zipfile
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import quote
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Directorio para los archivos temporales de medios (None usa el del sistema)
+MEDIA_TMP_DIR = os.environ.get("MEDIA_TMP_DIR") or None
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def new_temp_path(suffix: str = "") -> str:
+    """Crea un archivo temporal vacío y único; quien lo pide es responsable de borrarlo."""
+    fd, path = tempfile.mkstemp(prefix="media_", suffix=suffix, dir=MEDIA_TMP_DIR)
+    os.close(fd)
+    return path
+
+
+@contextmanager
+def temp_path(suffix: str = ""):
+    """Ruta temporal única para una solicitud; el archivo se borra al salir."""
+    path = new_temp_path(suffix)
+    try:
+        yield path
+    finally:
+        remove_file(path)
+
+
+@asynccontextmanager
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, digest=None):
+    """
+    Copia el archivo subido por bloques a un temporal único y entrega su ruta,
+    sin cargar todo el contenido en memoria. Corta con 413 apenas se supera max_bytes.
+    Si se pasa digest (p. ej. hashlib.sha256()), se actualiza con el contenido mientras se copia.
+    """
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    with temp_path(suffix) as path:
+        size = 0
+        with open(path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"El archivo supera el tamaño máximo de {max_bytes} bytes.")
+                out.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+        yield path
+
+
+def _parse_range(range_header: str, file_size: int):
+    """Interpreta un encabezado Range de un solo rango. Devuelve (inicio, fin) o None si no aplica."""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1) == "":
+        # Sufijo: los últimos N bytes
+        length = int(match.group(2))
+        if length == 0:
+            raise ValueError("Rango vacío")
+        return max(file_size - length, 0), file_size - 1
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else file_size - 1
+    if start >= file_size or end < start:
+        raise ValueError("Rango fuera del archivo")
+    return start, min(end, file_size - 1)
+
+
+def _iter_file(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def stream_file_response(path: str, media_type: str, download_name: str,
+                         range_header: str = None, delete_after: bool = True,
+                         extra_headers: dict = None) -> StreamingResponse:
+    """
+    Envía el archivo por bloques con Content-Length, Content-Disposition y soporte de Range (206).
+    Con delete_after el archivo se borra cuando termina la respuesta.
+    """
+    cleanup = BackgroundTask(remove_file, path) if delete_after else None
+    file_size = os.path.getsize(path)
+
+    quoted_name = quote(download_name)
+    if quoted_name == download_name:
+        disposition = f'attachment; filename="{download_name}"'
+    else:
+        disposition = f"attachment; filename*=utf-8''{quoted_name}"
+    headers = {"Accept-Ranges": "bytes", "Content-Disposition": disposition, **(extra_headers or {})}
+
+    start, end, status_code = 0, file_size - 1, 200
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, file_size)
+        except ValueError:
+            if delete_after:
+                remove_file(path)
+            raise HTTPException(status_code=416, detail="Rango no satisfacible.",
+                                headers={"Content-Range": f"bytes */{file_size}"})
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file(path, start, end), status_code=status_code, media_type=media_type,
+                             headers=headers, background=cleanup)
+
+
+class _ZipStream:
+    """Destino de solo escritura para zipfile: acumula lo escrito hasta que se envía al cliente."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+async def iter_zip(entries):
+    """
+    Genera un ZIP por bloques a partir de un iterador asíncrono de (nombre, ruta o bytes), enviando
+    cada entrada apenas está disponible. Se guarda sin comprimir: imágenes y videos ya lo están.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for name, content in entries:
+            if isinstance(content, bytes):
+                archive.writestr(name, content)
+            else:
+                info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+                # Con el tamaño conocido zipfile decide si necesita ZIP64 sin poder retroceder
+                info.file_size = os.path.getsize(content)
+                with open(content, "rb") as src, archive.open(info, "w") as dst:
+                    while chunk := await asyncio.to_thread(src.read, DOWNLOAD_CHUNK_SIZE):
+                        dst.write(chunk)
+                        yield stream.drain()
+            yield stream.drain()
+    yield stream.drain()
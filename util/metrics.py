@@ -0,0 +1,99 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo.monitoring import CommandListener
+
+from util.timing import StageTimer
+
+# Cada worker de uvicorn expone sus propias métricas; Prometheus las agrega por instancia.
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de las solicitudes HTTP por ruta.",
+    ["method", "route", "status"],
+)
+MEDIA_STAGE_LATENCY = Histogram(
+    "media_stage_duration_seconds", "Tiempo por etapa del procesamiento de medios.",
+    ["operation", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+MEDIA_BYTES = Counter(
+    "media_bytes_total", "Bytes de archivos de medios recibidos y generados.",
+    ["operation", "direction"],
+)
+MEDIA_FRAMES = Counter(
+    "media_frames_processed_total", "Frames decodificados o procesados.",
+    ["operation"],
+)
+RESULT_CACHE_REQUESTS = Counter(
+    "media_result_cache_requests_total", "Consultas al caché de resultados de medios.",
+    ["operation", "result"],
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "Latencia de los comandos enviados a MongoDB.",
+    ["command", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def register_runtime_gauges(video_cache, view_counter, pool_metrics, get_media_pool):
+    """Gauges que se leen al momento de cada scrape a partir del estado de los componentes."""
+    Gauge("video_cache_entries", "Entradas en el caché de videos.").set_function(lambda: len(video_cache.entries))
+    Gauge("video_cache_hits", "Aciertos acumulados del caché de videos.").set_function(lambda: video_cache.hits)
+    Gauge("video_cache_misses", "Fallos acumulados del caché de videos.").set_function(lambda: video_cache.misses)
+    Gauge("view_counter_pending", "Incrementos de vistas aún no guardados.") \
+        .set_function(lambda: view_counter.total_pending)
+    Gauge("mongo_pool_checked_out", "Conexiones a Mongo en uso.").set_function(lambda: pool_metrics.checked_out)
+    Gauge("mongo_pool_open", "Conexiones a Mongo abiertas.").set_function(lambda: pool_metrics.open_connections)
+    Gauge("mongo_pool_wait_seconds_max", "Espera máxima por una conexión.") \
+        .set_function(lambda: pool_metrics.wait_time_max)
+    Gauge("media_pool_pending", "Trabajos de medios en ejecución o en cola.") \
+        .set_function(lambda: get_media_pool().pending if get_media_pool() else 0)
+
+
+def record_media_job(operation: str, timer: StageTimer, bytes_in: int = 0, bytes_out: int = 0):
+    """Registra los tiempos por etapa que devuelve una tarea del pool de medios."""
+    for stage, seconds in timer.stages.items():
+        MEDIA_STAGE_LATENCY.labels(operation, stage).observe(seconds)
+    MEDIA_FRAMES.labels(operation).inc(timer.frames)
+    MEDIA_BYTES.labels(operation, "in").inc(bytes_in)
+    MEDIA_BYTES.labels(operation, "out").inc(bytes_out)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide la latencia de cada solicitud con la plantilla de la ruta como etiqueta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Las rutas no encontradas se agrupan para no crear una serie por URL
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route_path, str(status_code)) \
+                .observe(time.perf_counter() - start)
+
+
+class MongoCommandMetrics(CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, "success").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, "failure").observe(event.duration_micros / 1e6)
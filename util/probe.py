@@ -0,0 +1,346 @@
+import os
+import struct
+from typing import Optional
+
+from config.media import HEADER_STRUCT
+
+# Lectura del formato real y las dimensiones de un portador a partir de sus encabezados, sin
+# decodificar píxeles ni importar numpy, Pillow o ffmpeg. El proceso principal la usa para
+# rechazar archivos inválidos, demasiado grandes o sin capacidad antes de ocupar el pool de medios.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+GIF_SIGNATURES = (b'GIF87a', b'GIF89a')
+# Boxes con los que puede empezar un MP4 o un MOV (formato ISO base media / QuickTime)
+ISO_FIRST_BOXES = (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip')
+# Encabezado EBML con el que empieza todo Matroska (.mkv)
+EBML_MAGIC = b'\x1a\x45\xdf\xa3'
+
+EXTENSION_INTRODUCER = 0x21
+IMAGE_SEPARATOR = 0x2C
+GIF_TRAILER = 0x3B
+
+DESCRIPTOR_STRUCT = struct.Struct('<BHHHHB')
+SCREEN_STRUCT = struct.Struct('<HHBBB')
+
+# Marcadores Start Of Frame de JPEG: C0-CF menos DHT (C4), JPG (C8) y DAC (CC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Marcadores sin longitud: TEM y los reinicios RST0-RST7
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+JPEG_SOS = 0xDA
+JPEG_EOI = 0xD9
+
+# dwTotalFrames, dwWidth y dwHeight dentro de los 40 bytes de MainAVIHeader
+AVI_MAIN_HEADER = struct.Struct('<16xI12xII')
+
+# IDs de los elementos Matroska que llevan a las dimensiones de la pista de video
+MKV_SEGMENT = 0x18538067
+MKV_TRACKS = 0x1654AE6B
+MKV_CLUSTER = 0x1F43B675
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_VIDEO_TRACK = 1
+
+
+class CarrierInfo:
+    """Formato real y tamaño de un portador. frames es None si el encabezado no lo indica."""
+
+    def __init__(self, format: str, width: int, height: int, frames: Optional[int] = 1):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.frames = frames
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def capacity_bits(self) -> Optional[int]:
+        """Bits que caben en los LSB de los canales RGB de todos los frames."""
+        if self.frames is None:
+            return None
+        return self.pixels * 3 * self.frames
+
+
+def message_bits(message: str) -> int:
+    """Bits que ocupa el mensaje con su encabezado, igual que util.steganography.message_to_bits."""
+    return (HEADER_STRUCT.size + len(message.encode('utf-8'))) * 8
+
+
+def color_table_size(flags: int) -> int:
+    return 3 << ((flags & 0x07) + 1)
+
+
+def _read(file, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("El archivo está incompleto.")
+    return data
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Formato según los primeros 12 bytes del archivo, o None si no es uno soportado."""
+    if head.startswith(PNG_SIGNATURE):
+        return 'png'
+    if head.startswith(JPEG_SIGNATURE):
+        return 'jpeg'
+    if head[:6] in GIF_SIGNATURES:
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'avi'
+    if head[4:8] in ISO_FIRST_BOXES:
+        return 'mp4'
+    if head.startswith(EBML_MAGIC):
+        return 'mkv'
+    return None
+
+
+def _probe_png(file, needed_bits: int) -> CarrierInfo:
+    file.seek(len(PNG_SIGNATURE))
+    _, chunk, width, height = struct.unpack('>I4sII', _read(file, 16))
+    if chunk != b'IHDR':
+        raise ValueError("El PNG está dañado.")
+    return CarrierInfo('png', width, height)
+
+
+def _probe_jpeg(file, needed_bits: int) -> CarrierInfo:
+    file.seek(2)
+    while True:
+        if _read(file, 1) != b'\xff':
+            raise ValueError("El JPEG está dañado.")
+        marker = _read(file, 1)[0]
+        # Cualquier cantidad de 0xFF puede rellenar antes del marcador
+        while marker == 0xFF:
+            marker = _read(file, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (JPEG_SOS, JPEG_EOI):
+            raise ValueError("El JPEG no indica sus dimensiones.")
+
+        length = struct.unpack('>H', _read(file, 2))[0]
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack('>BHH', _read(file, 5))
+            return CarrierInfo('jpeg', width, height)
+        if length < 2:
+            raise ValueError("El JPEG está dañado.")
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def _skip_sub_blocks(file):
+    while True:
+        size = _read(file, 1)[0]
+        if size == 0:
+            return
+        file.seek(size, os.SEEK_CUR)
+
+
+def _probe_gif(file, needed_bits: int) -> CarrierInfo:
+    """Cuenta los frames saltando sus datos LZW; con needed_bits se detiene al alcanzar esa capacidad."""
+    file.seek(6)
+    width, height, flags, _, _ = SCREEN_STRUCT.unpack(_read(file, SCREEN_STRUCT.size))
+    if flags & 0x80:
+        file.seek(color_table_size(flags), os.SEEK_CUR)
+
+    # El modo RGB convierte cada frame al tamaño completo de la pantalla lógica
+    info = CarrierInfo('gif', width, height, frames=0)
+    while needed_bits is None or info.capacity_bits < needed_bits:
+        introducer = file.read(1)
+        if not introducer or introducer[0] == GIF_TRAILER:
+            break
+        if introducer[0] == EXTENSION_INTRODUCER:
+            _read(file, 1)
+            _skip_sub_blocks(file)
+        elif introducer[0] == IMAGE_SEPARATOR:
+            flags = DESCRIPTOR_STRUCT.unpack(introducer + _read(file, DESCRIPTOR_STRUCT.size - 1))[5]
+            if flags & 0x80:
+                file.seek(color_table_size(flags), os.SEEK_CUR)
+            # Tamaño mínimo de código LZW y luego los datos comprimidos
+            _read(file, 1)
+            _skip_sub_blocks(file)
+            info.frames += 1
+        else:
+            raise ValueError("El GIF está dañado.")
+
+    if not info.frames:
+        raise ValueError("El GIF no tiene frames.")
+    return info
+
+
+def _iter_boxes(file, start: int, end: int):
+    """(tipo, inicio del contenido, fin) de cada box entre start y end."""
+    position = start
+    while position + 8 <= end:
+        file.seek(position)
+        size, kind = struct.unpack('>I4s', _read(file, 8))
+        content = position + 8
+        if size == 1:
+            size = struct.unpack('>Q', _read(file, 8))[0]
+            content += 8
+        elif size == 0:
+            # El último box puede llegar hasta el final del archivo
+            size = end - position
+        if size < content - position:
+            raise ValueError("El video está dañado.")
+        yield kind, content, min(position + size, end)
+        position += size
+
+
+def _find_box(file, start: int, end: int, *path: bytes):
+    """Rango (inicio del contenido, fin) del box al final de path, o None si no existe."""
+    for kind in path:
+        for child, child_start, child_end in _iter_boxes(file, start, end):
+            if child == kind:
+                start, end = child_start, child_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _probe_mp4(file, needed_bits: int) -> CarrierInfo:
+    """Lee la primera pista de video: ancho y alto de su stsd y la cantidad de muestras de su stsz."""
+    moov = _find_box(file, 0, file.seek(0, os.SEEK_END), b'moov')
+    if moov is None:
+        raise ValueError("El video no tiene encabezado (moov).")
+
+    for kind, start, end in _iter_boxes(file, *moov):
+        if kind != b'trak':
+            continue
+        hdlr = _find_box(file, start, end, b'mdia', b'hdlr')
+        if hdlr is None:
+            continue
+        # versión y flags, pre_defined y el tipo de manejador
+        file.seek(hdlr[0] + 8)
+        if _read(file, 4) != b'vide':
+            continue
+
+        stbl = _find_box(file, start, end, b'mdia', b'minf', b'stbl')
+        stsd = stbl and _find_box(file, *stbl, b'stsd')
+        if stsd is None:
+            raise ValueError("El video está dañado.")
+        # Primera entrada visual: versión y flags, cantidad de entradas y 32 bytes antes del ancho
+        file.seek(stsd[0] + 40)
+        width, height = struct.unpack('>HH', _read(file, 4))
+
+        # stz2 tiene la cantidad de muestras en la misma posición que stsz
+        sizes = _find_box(file, *stbl, b'stsz') or _find_box(file, *stbl, b'stz2')
+        frames = None
+        if sizes is not None:
+            file.seek(sizes[0] + 8)
+            # Los MP4 fragmentados dejan la tabla vacía y describen las muestras en cada fragmento
+            frames = struct.unpack('>I', _read(file, 4))[0] or None
+        return CarrierInfo('mp4', width, height, frames)
+
+    raise ValueError("El archivo no tiene una pista de video.")
+
+
+def _probe_avi(file, needed_bits: int) -> CarrierInfo:
+    file.seek(12)
+    list_tag, _, list_type, chunk, size = struct.unpack('<4sI4s4sI', _read(file, 20))
+    if list_tag != b'LIST' or list_type != b'hdrl' or chunk != b'avih' or size < AVI_MAIN_HEADER.size:
+        raise ValueError("El AVI está dañado.")
+    frames, width, height = AVI_MAIN_HEADER.unpack(_read(file, AVI_MAIN_HEADER.size))
+    return CarrierInfo('avi', width, height, frames or None)
+
+
+def _read_vint(file, keep_marker: bool):
+    """Entero de largo variable de EBML: (valor, bytes leídos). Los IDs conservan el bit marcador."""
+    first = _read(file, 1)[0]
+    length = 9 - first.bit_length()
+    if length > 8:
+        raise ValueError("El video está dañado.")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in _read(file, length - 1):
+        value = value << 8 | byte
+    return value, length
+
+
+def _iter_elements(file, start: int, end: int):
+    """(ID, inicio del contenido, fin) de cada elemento EBML entre start y end."""
+    position = start
+    while position < end:
+        file.seek(position)
+        element, id_length = _read_vint(file, keep_marker=True)
+        size, size_length = _read_vint(file, keep_marker=False)
+        content = position + id_length + size_length
+        if size == (1 << 7 * size_length) - 1:
+            # Tamaño desconocido (escritura en streaming): el elemento llega hasta el final del padre
+            size = end - content
+        yield element, content, min(content + size, end)
+        position = content + size
+
+
+def _read_uint(file, start: int, end: int) -> int:
+    if end - start > 8:
+        raise ValueError("El video está dañado.")
+    file.seek(start)
+    return int.from_bytes(_read(file, end - start), 'big')
+
+
+def _probe_mkv(file, needed_bits: int) -> CarrierInfo:
+    """Lee ancho y alto de la primera pista de video. Matroska no indica la cantidad de frames."""
+    tracks = None
+    for element, start, end in _iter_elements(file, 0, file.seek(0, os.SEEK_END)):
+        if element != MKV_SEGMENT:
+            continue
+        for child, child_start, child_end in _iter_elements(file, start, end):
+            if child == MKV_TRACKS:
+                tracks = child_start, child_end
+                break
+            if child == MKV_CLUSTER:
+                # Los frames van después de los encabezados: no hace falta recorrerlos
+                break
+        break
+    if tracks is None:
+        raise ValueError("El video no tiene encabezado de pistas.")
+
+    for element, start, end in _iter_elements(file, *tracks):
+        if element != MKV_TRACK_ENTRY:
+            continue
+        track_type, video = None, None
+        for child, child_start, child_end in _iter_elements(file, start, end):
+            if child == MKV_TRACK_TYPE:
+                track_type = _read_uint(file, child_start, child_end)
+            elif child == MKV_VIDEO:
+                video = child_start, child_end
+        if track_type != MKV_VIDEO_TRACK or video is None:
+            continue
+
+        dimensions = {}
+        for child, child_start, child_end in _iter_elements(file, *video):
+            if child in (MKV_PIXEL_WIDTH, MKV_PIXEL_HEIGHT):
+                dimensions[child] = _read_uint(file, child_start, child_end)
+        return CarrierInfo('mkv', dimensions.get(MKV_PIXEL_WIDTH, 0), dimensions.get(MKV_PIXEL_HEIGHT, 0),
+                           frames=None)
+
+    raise ValueError("El archivo no tiene una pista de video.")
+
+
+PROBES = {
+    'png': _probe_png,
+    'jpeg': _probe_jpeg,
+    'gif': _probe_gif,
+    'mp4': _probe_mp4,
+    'avi': _probe_avi,
+    'mkv': _probe_mkv,
+}
+
+
+def probe_carrier(path: str, needed_bits: int = None) -> CarrierInfo:
+    """
+    Lanza ValueError si el formato no es soportado o el encabezado está dañado. needed_bits solo
+    acota la lectura de los GIF: al alcanzar esa capacidad frames queda como cota inferior.
+    """
+    with open(path, 'rb') as file:
+        format = sniff_format(file.read(12))
+        if format is None:
+            raise ValueError("Formato de archivo no soportado.")
+        info = PROBES[format](file, needed_bits)
+
+    if not info.width or not info.height:
+        raise ValueError("El archivo no tiene dimensiones válidas.")
+    return info
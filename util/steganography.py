@@ -1,7 +1,26 @@
+import zlib
+
 import numpy as np
 from PIL import Image
 import io
 
+from config.media import HEADER_MAGIC, HEADER_VERSION, HEADER_STRUCT, HEADER_BITS, MAX_MESSAGE_LENGTH, \
+    PNG_COMPRESS_LEVEL, PNG_OPTIMIZE
+from util.timing import StageTimer
+
+DELIMITER = '1111111111111110'  # Delimitador del formato antiguo (15 unos y un cero)
+
+# Un mensaje de MAX_MESSAGE_LENGTH caracteres en UTF-8 nunca supera este tamaño
+MAX_PAYLOAD_BYTES = MAX_MESSAGE_LENGTH * 4
+# Los mensajes del formato antiguo se buscan como máximo hasta aquí
+LEGACY_MAX_BITS = MAX_MESSAGE_LENGTH * 8 + len(DELIMITER)
+# Bytes que pueden aparecer en un mensaje del formato antiguo (texto imprimible en latin-1)
+LEGACY_PRINTABLE = np.array([chr(b).isprintable() for b in range(256)])
+
+# Tamaño inicial y máximo (en canales) de los bloques en que se busca el delimitador
+SCAN_FIRST_CHUNK = 1 << 12
+SCAN_MAX_CHUNK = 1 << 18
+
 
 def to_bin(data):
     if isinstance(data, str):
@@ -14,128 +33,269 @@ def to_bin(data):
         raise TypeError("Tipo de dato no soportado para conversión a binario.")
 
 
-def hide_message_image(image_bytes: bytes, message: str) -> bytes:
-    img = Image.open(io.BytesIO(image_bytes))
-    width, height = img.size
+def message_to_bits(message: str) -> np.ndarray:
+    """Convierte el mensaje en bits uint8: encabezado versionado seguido del payload UTF-8."""
+    payload = message.encode('utf-8')
+    header = HEADER_STRUCT.pack(HEADER_MAGIC, HEADER_VERSION, len(payload), zlib.crc32(payload))
+    return np.unpackbits(np.frombuffer(header + payload, dtype=np.uint8))
+
+
+def bits_to_message(bits: np.ndarray) -> str:
+    """Decodifica bits en grupos de 8 (el último grupo puede ser incompleto)."""
+    full = len(bits) - len(bits) % 8
+    message = np.packbits(bits[:full]).tobytes().decode('latin-1')
+    if full < len(bits):
+        message += chr(int(''.join(str(b) for b in bits[full:]), 2))
+    return message
+
+
+def embed_bits(channels: np.ndarray, bits: np.ndarray) -> None:
+    """Reemplaza el LSB de los primeros len(bits) canales, en sitio."""
+    n = len(bits)
+    channels[:n] = (channels[:n] & 0xFE) | bits
+
+
+class DelimiterScanner:
+    """
+    Acumula los LSB de bloques de canales y busca el delimitador de forma vectorizada,
+    incluso cuando queda partido entre dos bloques (o dos frames).
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.tail = np.empty(0, dtype=np.uint8)
+        self.found = False
+
+    def feed(self, channels: np.ndarray) -> bool:
+        bits = (channels & 1).astype(np.uint8, copy=False)
+        window = np.concatenate((self.tail, bits))
+        offset = self.length - len(self.tail)
+
+        # Un delimitador termina en i si window[i] == 0 y los 15 bits anteriores son unos
+        ones = np.concatenate(([0], np.cumsum(window, dtype=np.int64)))
+        ends = np.arange(15, len(window))
+        hits = ends[(window[15:] == 0) & (ones[ends] - ones[ends - 15] == 15)]
+
+        if len(hits):
+            end = offset + int(hits[0]) + 1
+            self.chunks.append(bits)
+            self.length += len(bits)
+            self._truncate(end)
+            self.found = True
+            return True
+
+        self.chunks.append(bits)
+        self.length += len(bits)
+        self.tail = window[-15:]
+        return False
+
+    def _truncate(self, length: int):
+        bits = np.concatenate(self.chunks) if self.chunks else np.empty(0, dtype=np.uint8)
+        self.chunks = [bits[:length]]
+        self.length = length
+
+    def bits(self) -> np.ndarray:
+        if not self.chunks:
+            return np.empty(0, dtype=np.uint8)
+        return np.concatenate(self.chunks)
+
+
+class PayloadExtractor:
+    """
+    Extrae el mensaje de forma incremental leyendo solo los bits necesarios:
+    primero el encabezado y luego exactamente el largo que este indica.
+    Si no hay encabezado válido se intenta el formato antiguo con delimitador. Como esos mensajes
+    son texto, la búsqueda se abandona en el primer byte no imprimible: en un portador sin mensaje
+    suele ocurrir ya dentro de los bits del encabezado. LEGACY_MAX_BITS acota el resto de los casos.
+    """
+
+    def __init__(self, legacy_fallback: bool = True):
+        self.legacy_fallback = legacy_fallback
+        self.chunks = []
+        self.length = 0
+        self.needed = HEADER_BITS
+        self.scanner = None
+        self.legacy_rest = np.empty(0, dtype=np.uint8)
+        self.done = False
+        self.message = ""
+
+    def feed(self, channels: np.ndarray) -> bool:
+        if self.done:
+            return True
+
+        if self.scanner is not None:
+            return self._feed_legacy(channels)
 
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
+        bits = (channels[:self.needed - self.length] & 1).astype(np.uint8, copy=False)
+        self.chunks.append(bits)
+        self.length += len(bits)
+        if self.length < self.needed:
+            return False
 
-    binary_message = to_bin(message) + '1111111111111110'  # Delimitador para el final del mensaje
+        data = np.packbits(np.concatenate(self.chunks)).tobytes()
+        if self.needed == HEADER_BITS:
+            magic, version, size, crc = HEADER_STRUCT.unpack(data)
+            if magic != HEADER_MAGIC or version != HEADER_VERSION or size > MAX_PAYLOAD_BYTES:
+                return self._start_legacy(channels[len(bits):])
+            self.crc = crc
+            self.needed = HEADER_BITS + size * 8
+            if size:
+                return self.feed(channels[len(bits):])
 
-    if len(binary_message) > width * height * 3:
+        payload = data[HEADER_STRUCT.size:]
+        if zlib.crc32(payload) == self.crc:
+            try:
+                self.message = payload.decode('utf-8')
+            except UnicodeDecodeError:
+                pass
+        self.done = True
+        return True
+
+    def _start_legacy(self, rest: np.ndarray) -> bool:
+        if not self.legacy_fallback:
+            self.done = True
+            return True
+        self.scanner = DelimiterScanner()
+        header = np.concatenate(self.chunks)
+        self.chunks = []
+        if not self.scanner.feed(header) and not self._legacy_printable(header):
+            self.done = True
+            return True
+        return self._feed_legacy(rest)
+
+    def _legacy_printable(self, channels: np.ndarray) -> bool:
+        """Si los bytes completos hasta ahora pueden ser parte de un mensaje del formato antiguo."""
+        bits = np.concatenate((self.legacy_rest, (channels & 1).astype(np.uint8, copy=False)))
+        full = len(bits) - len(bits) % 8
+        self.legacy_rest = bits[full:]
+        return bool(LEGACY_PRINTABLE[np.packbits(bits[:full])].all())
+
+    def _feed_legacy(self, channels: np.ndarray) -> bool:
+        remaining = LEGACY_MAX_BITS - self.scanner.length
+        if not self.scanner.found and len(channels):
+            channels = channels[:remaining]
+            if not self.scanner.feed(channels) and not self._legacy_printable(channels):
+                self.done = True
+                return True
+        if self.scanner.found:
+            bits = self.scanner.bits()[:-len(DELIMITER)]
+            message = bits_to_message(bits)
+            # Descarta delimitadores que aparecen por azar en portadores sin mensaje
+            if len(bits) % 8 == 0 and message.isprintable():
+                self.message = message
+            self.done = True
+        elif self.scanner.length >= LEGACY_MAX_BITS:
+            self.done = True
+        return self.done
+
+
+def _iter_chunks(channels: np.ndarray):
+    # Bloques que crecen al doble: los mensajes cortos se encuentran sin recorrer toda la imagen
+    start, size = 0, SCAN_FIRST_CHUNK
+    while start < len(channels):
+        yield channels[start:start + size]
+        start += size
+        size = min(size * 2, SCAN_MAX_CHUNK)
+
+
+def _frame_channels(frame: np.ndarray) -> np.ndarray:
+    """Canales RGB del frame aplanados en orden (y, x, canal)."""
+    return np.ascontiguousarray(frame[..., :3]).reshape(-1)
+
+
+def hide_message_image(image_bytes: bytes, message: str, timer: StageTimer = None,
+                       compress_level: int = None, optimize: bool = None) -> bytes:
+    timer = timer or StageTimer()
+    with timer.stage("decode"):
+        # open solo lee el encabezado: si el mensaje no cabe no se decodifican los píxeles
+        img = Image.open(io.BytesIO(image_bytes))
+        width, height = img.size
+
+    bits = message_to_bits(message)
+
+    if len(bits) > width * height * 3:
         raise ValueError("El mensaje es demasiado largo para esta imagen.")
 
-    data_index = 0
-    img_data = img.getdata()
-
-    new_img = Image.new(img.mode, img.size)
-    new_img_data = []
-
-    for pixel in img_data:
-        if data_index < len(binary_message):
-            new_pixel = list(pixel)
-            for i in range(3):
-                if data_index < len(binary_message):
-                    current_bit = int(binary_message[data_index])
-                    new_pixel[i] = (new_pixel[i] & ~1) | current_bit
-                    data_index += 1
-            new_img_data.append(tuple(new_pixel))
-        else:
-            new_img_data.append(pixel)
-
-    new_img.putdata(new_img_data)
-
-    output_buffer = io.BytesIO()
-    new_img.save(output_buffer, format="PNG")
-    output_buffer.seek(0)
-    return output_buffer.getvalue()
+    with timer.stage("decode"):
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.load()
+    with timer.stage("embed"):
+        # Solo se copian a numpy y se modifican las primeras filas, las que alcanzan para el payload;
+        # np.asarray de la imagen completa copiaría todos los píxeles
+        rows = -(-len(bits) // (width * 3))
+        head = np.array(img.crop((0, 0, width, rows)))
+        embed_bits(head.reshape(-1), bits)
+        img.paste(Image.fromarray(head), (0, 0))
 
+    with timer.stage("encode"):
+        output_buffer = io.BytesIO()
+        img.save(output_buffer, format="PNG",
+                 compress_level=PNG_COMPRESS_LEVEL if compress_level is None else compress_level,
+                 optimize=PNG_OPTIMIZE if optimize is None else optimize)
+    return output_buffer.getvalue()
 
-def reveal_message_image(image_bytes: bytes) -> str:
-    img = Image.open(io.BytesIO(image_bytes))
 
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
+def reveal_message_image(image_bytes: bytes, timer: StageTimer = None) -> str:
+    timer = timer or StageTimer()
+    with timer.stage("decode"):
+        img = Image.open(io.BytesIO(image_bytes))
 
-    binary_message = ""
-    img_data = img.getdata()
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
 
-    for pixel in img_data:
-        for i in range(3):
-            binary_message += to_bin(pixel[i])[-1]
+        channels = np.asarray(img).reshape(-1)
 
-            # El delimitador es '1111111111111110' (14 unos y un cero)
-            if binary_message[-16:] == '1111111111111110':
+    with timer.stage("extract"):
+        extractor = PayloadExtractor()
+        for chunk in _iter_chunks(channels):
+            if extractor.feed(chunk):
                 break
-        if binary_message[-16:] == '1111111111111110':
-            break
 
-    binary_message = binary_message[:-16]
+    return extractor.message
 
-    message = ""
-    for i in range(0, len(binary_message), 8):
-        byte = binary_message[i:i + 8]
-        message += chr(int(byte, 2))
 
-    return message
-
-def hide_message_in_frames(frames: list, message: str) -> list:
-    binary_message = to_bin(message) + '1111111111111110'
+def hide_message_in_frames(frames: list, message: str, timer: StageTimer = None) -> list:
+    timer = timer or StageTimer()
+    bits = message_to_bits(message)
     data_index = 0
     new_frames = []
 
     for frame in frames:
-        if data_index >= len(binary_message):
+        timer.frames += 1
+        if data_index >= len(bits):
             new_frames.append(frame)
             continue
 
-        frame_copy = np.copy(frame)
-        height, width, _ = frame_copy.shape
-        for y in range(height):
-            for x in range(width):
-                if data_index >= len(binary_message):
-                    break
-                r, g, b = frame_copy[y, x]
-                for i in range(3):
-                    if data_index < len(binary_message):
-                        current_bit = int(binary_message[data_index])
-                        frame_copy[y, x, i] = (frame_copy[y, x, i] & 0xFE) | current_bit
-
-                        data_index += 1
-            if data_index >= len(binary_message):
-                break
+        with timer.stage("embed"):
+            frame_copy = np.copy(frame)
+            channels = _frame_channels(frame_copy)
+            chunk = bits[data_index:data_index + len(channels)]
+            embed_bits(channels, chunk)
+            frame_copy[..., :3] = channels.reshape(frame_copy.shape[:-1] + (3,))
+        data_index += len(chunk)
         new_frames.append(frame_copy)
+
+    if data_index < len(bits):
+        raise ValueError("El mensaje es demasiado largo para este archivo.")
     return new_frames
 
-def reveal_message_from_frames(frames: list) -> str:
-    binary_message = ""
-    found_delimiter = False
-    for frame in frames:
-        height, width, _ = frame.shape
-        for y in range(height):
-            for x in range(width):
-                r, g, b = frame[y, x]
-                for channel_val in [int(r), int(g), int(b)]:
-                    binary_message += to_bin(channel_val)[-1]
-                    if len(binary_message) >= 16 and binary_message[-16:] == '1111111111111110':
-                        found_delimiter = True
-                        break
-                if found_delimiter:
+
+def reveal_message_from_frames(frames, timer: StageTimer = None) -> str:
+    """
+    Acepta cualquier iterable de frames (lista o generador); deja de consumirlo
+    en cuanto el mensaje está completo, así solo se decodifican los frames necesarios.
+    """
+    timer = timer or StageTimer()
+    extractor = PayloadExtractor()
+    for frame in timer.timed_iter(frames, "decode"):
+        timer.frames += 1
+        with timer.stage("extract"):
+            for chunk in _iter_chunks(_frame_channels(np.asarray(frame))):
+                if extractor.feed(chunk):
                     break
-            if found_delimiter:
-                break
-        if found_delimiter:
+        if extractor.done:
             break
 
-    if found_delimiter:
-        binary_message = binary_message[:-16]
-        message = ""
-        try:
-            for i in range(0, len(binary_message), 8):
-                byte = binary_message[i:i+8]
-                message += chr(int(byte, 2))
-            return message
-        except ValueError:
-            return ""
-    return ""
\ No newline at end of file
+    return extractor.message
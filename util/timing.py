@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Acumula el tiempo por etapa (decode, embed, extract, encode...) y los frames procesados.
+    Es un objeto simple para poder devolverlo desde los procesos del pool de medios.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.frames = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def timed_iter(self, iterable, name: str):
+        """Recorre iterable contando como etapa name el tiempo de obtener cada elemento (p. ej. decodificar un frame)."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
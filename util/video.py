@@ -0,0 +1,83 @@
+import imageio_ffmpeg
+import numpy as np
+
+from config.media import VIDEO_CODECS, DEFAULT_VIDEO_CODEC
+from util.steganography import message_to_bits, embed_bits
+from util.timing import StageTimer
+
+# Códecs de audio que el contenedor mp4 acepta sin recodificar
+MP4_AUDIO_CODECS = ("aac", "mp3", "ac3", "eac3", "opus", "alac", "flac")
+
+
+def _audio_codec_for(source_codec: str, extension: str) -> str:
+    if extension == ".mp4" and not source_codec.startswith(MP4_AUDIO_CODECS):
+        return "aac"
+    return "copy"
+
+
+def hide_message_in_video(input_path: str, output_path: str, message: str,
+                          codec: str = DEFAULT_VIDEO_CODEC, progress=None, timer: StageTimer = None) -> int:
+    """
+    Decodifica el video frame por frame, modifica solo los frames que reciben bits del
+    mensaje y envía todo directamente al proceso de ffmpeg que escribe la salida.
+    La pista de audio original se copia sin recodificar cuando el contenedor lo permite.
+    progress, si se indica, recibe la cantidad de frames procesados. Devuelve el total de frames.
+    """
+    if codec not in VIDEO_CODECS:
+        raise ValueError(f"Códec de video no soportado: {codec}")
+    profile = VIDEO_CODECS[codec]
+
+    timer = timer or StageTimer()
+    bits = message_to_bits(message)
+    data_index = 0
+    frame_index = 0
+
+    reader = imageio_ffmpeg.read_frames(input_path, pix_fmt="rgb24")
+    try:
+        meta = next(reader)
+        width, height = meta["size"]
+
+        audio_params = {}
+        if meta.get("audio_codec"):
+            audio_params = {
+                "audio_path": input_path,
+                "audio_codec": _audio_codec_for(meta["audio_codec"], profile["extension"]),
+            }
+
+        writer = imageio_ffmpeg.write_frames(
+            output_path,
+            (width, height),
+            fps=meta["fps"],
+            codec=profile["codec"],
+            pix_fmt_out=profile["pix_fmt_out"],
+            output_params=list(profile["output_params"]),
+            quality=None,
+            macro_block_size=1,
+            **audio_params,
+        )
+        writer.send(None)
+        try:
+            for frame_index, frame in enumerate(timer.timed_iter(reader, "decode"), start=1):
+                if data_index < len(bits):
+                    with timer.stage("embed"):
+                        channels = np.frombuffer(frame, dtype=np.uint8).copy()
+                        chunk = bits[data_index:data_index + len(channels)]
+                        embed_bits(channels, chunk)
+                    data_index += len(chunk)
+                    frame = channels
+                with timer.stage("encode"):
+                    writer.send(frame)
+                if progress:
+                    progress(frame_index)
+        finally:
+            with timer.stage("encode"):
+                # Cerrar el writer espera a que ffmpeg termine de codificar
+                writer.close()
+    finally:
+        reader.close()
+
+    timer.frames += frame_index
+
+    if data_index < len(bits):
+        raise ValueError("El mensaje es demasiado largo para este archivo.")
+    return frame_index